@@ -0,0 +1,326 @@
+"""Offline benchmark of the API clients hot calls.
+
+Every client is pointed to the local fake server (see fakeservers.py),
+for every hot call are measured throughput, p50/p99 latency and memory.
+Memory (tracemalloc peak) is measured by the separate sequential pass
+of --memory-iterations calls, so tracing doesn't slow down the timed one.
+Results are printed (or written to --output) as JSON, --compare prints
+the ratios to the results of the previous run.
+
+Clients, whose dependencies (Django project, facebook-sdk,
+google-api-python-client) aren't importable, are reported as skipped.
+
+Usage:
+    python benchmarks/bench_clients.py [--latency MS] [--payload N]
+        [--error-rate F] [--iterations N] [--concurrency N]
+        [--memory-iterations N]
+        [--only NAME [NAME ...]] [--output FILE] [--compare FILE]
+
+"""
+import argparse
+import gc
+import json
+import math
+import os
+import re
+import shutil
+import sys
+import tempfile
+import timeit
+
+from multiprocessing.pool import ThreadPool
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import fakeservers  # noqa: E402
+
+
+def setup_exchange(url, config, cleanup):
+    from exchangeapi import ExchangeAPI
+
+    # skip __init__: it reads rates from DB
+    api = ExchangeAPI.__new__(ExchangeAPI)
+    api._required_currencies = set(fakeservers.currencies(2))
+    api_url = '{}/oxr/latest.json?app_id=benchmark'.format(url)
+    return {
+        'exchange.get_api_rates': lambda: api.get_api_rates(
+            api_url, api.required_currencies),
+    }
+
+
+def setup_uptimerobot(url, config, cleanup):
+    import uptimerobotapi
+
+    uptimerobotapi.UPTIMEROBOT_API_URL = url + \
+        '/uptimerobot/getMonitors?apiKey={}&noJsonCallback=1&format=json'
+    api = uptimerobotapi.UptimeRobotAPI('benchmark')
+    return {
+        'uptimerobot.get_monitors_states': api.get_monitors_states,
+    }
+
+
+def setup_virustotal(url, config, cleanup):
+    import virustotalapi
+
+    virustotalapi.VIRUSTOTAL_API_URL = url + '/virustotal/'
+    api = virustotalapi.VirusTotalAPI('benchmark')
+    return {
+        'virustotal.request': lambda: api.request('report', 'example.com'),
+    }
+
+
+def setup_facebook(url, config, cleanup):
+    import facebook
+    import facebookapi
+
+    facebookapi.FACEBOOK_GRAPH_URL = url + '/graph/'
+
+    class Account(object):
+        name = 'benchmark'
+        access_token = 'benchmark'
+        version_api = facebook.VALID_API_VERSIONS[-1]
+        use_luminati = False
+        ip_address = '127.0.0.1'
+        ad_fbaccount_id = '1'
+
+    api = facebookapi.FacebookAPI(Account())
+    return {
+        'facebook.get_spend_preset': lambda: api.get_spend_preset(
+            'last_3_days'),
+        'facebook.get_ad_accounts_properties': lambda: (
+            api.get_ad_accounts_properties('currency')),
+    }
+
+
+def setup_googleapi(url, config, cleanup):
+    from oauth2client.client import AccessTokenCredentials
+    import googleapi
+
+    # discovery documents point to the fake server
+    googleapi.DISCOVERY_ROOT_URL_RE = re.compile(
+        r'^{}/$'.format(re.escape(url)))
+    discovery_dir = tempfile.mkdtemp(prefix='bench-discovery-')
+    cleanup.append(discovery_dir)
+    for name, document in fakeservers.discovery_documents(url).items():
+        with open(os.path.join(discovery_dir, name + '.json'), 'w') as f:
+            json.dump(document, f)
+
+    client = googleapi.Client(
+        None,
+        folder='folder',
+        discovery_dir=discovery_dir,
+        threadsafe=True,
+        credentials=AccessTokenCredentials('benchmark', 'benchmark')
+    )
+    spreadsheet = googleapi.Spreadsheet(googleapi.File(client, {
+        'id': 'benchmark',
+        'name': 'benchmark',
+        'mimeType': googleapi.SPREADSHEET_TYPE,
+        'parents': ['folder'],
+    }))
+    sheet = spreadsheet.sheets[0]
+    rows = [
+        [row * fakeservers.SHEET_COLUMNS + column
+         for column in range(fakeservers.SHEET_COLUMNS)]
+        for row in range(config.payload)
+    ]
+    requests = [{
+        'updateSheetProperties': {
+            'properties': {'sheetId': sheet.id, 'hidden': False},
+            'fields': 'hidden'
+        }
+    }]
+    return {
+        'googleapi.get_files': lambda: client.get_files(folder='folder'),
+        'googleapi.put_rows': lambda: sheet.put_rows(1, rows),
+        'googleapi.get_columns': lambda: spreadsheet.get_columns(
+            ["'{}'!A1:E".format(sheet.title)]),
+        'googleapi.batch_update': lambda: spreadsheet.batch_update(requests),
+    }
+
+
+SETUPS = [
+    ('exchange', setup_exchange),
+    ('uptimerobot', setup_uptimerobot),
+    ('virustotal', setup_virustotal),
+    ('facebook', setup_facebook),
+    ('googleapi', setup_googleapi),
+]
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of the sorted list."""
+    if not values:
+        return None
+    index = int(math.ceil(percent / 100.0 * len(values))) - 1
+    return values[max(index, 0)]
+
+
+def maxrss():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def memory_peak(func, iterations):
+    """Peak of the memory allocated by the sequential calls, bytes."""
+    if tracemalloc is None or not iterations:
+        return None
+    gc.collect()
+    tracemalloc.start()
+    try:
+        for _ in range(iterations):
+            try:
+                func()
+            except Exception:
+                pass
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(func, iterations, concurrency, memory_iterations):
+    latencies = []
+    errors = []
+
+    def call(_):
+        started = timeit.default_timer()
+        try:
+            func()
+        except Exception as err:
+            errors.append(err.__class__.__name__)
+        else:
+            latencies.append(timeit.default_timer() - started)
+
+    gc.collect()
+    rss = maxrss()
+
+    started = timeit.default_timer()
+    if concurrency > 1:
+        pool = ThreadPool(concurrency)
+        try:
+            pool.map(call, range(iterations))
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        for i in range(iterations):
+            call(i)
+    elapsed = timeit.default_timer() - started
+    rss_delta = maxrss() - rss if rss is not None else None
+
+    latencies.sort()
+    ms = [latency * 1000 for latency in latencies]
+    return {
+        'calls': iterations,
+        'errors': len(errors),
+        'error_types': sorted(set(errors)),
+        'elapsed': elapsed,
+        'throughput': len(latencies) / elapsed if elapsed else None,
+        'mean_ms': sum(ms) / len(ms) if ms else None,
+        'p50_ms': percentile(ms, 50),
+        'p99_ms': percentile(ms, 99),
+        'memory_peak_bytes': memory_peak(func, memory_iterations),
+        'maxrss_delta_kb': rss_delta,
+    }
+
+
+def run(config, iterations, concurrency, memory_iterations, only=None):
+    server = fakeservers.FakeServer(config).start()
+    cleanup = []
+    results = {}
+    try:
+        for client, setup in SETUPS:
+            if only and client not in only:
+                continue
+            try:
+                calls = setup(server.url, config, cleanup)
+            except ImportError as err:
+                results[client] = {'skipped': str(err)}
+                continue
+            for name, func in sorted(calls.items()):
+                results[name] = measure(
+                    func, iterations, concurrency, memory_iterations)
+    finally:
+        server.stop()
+        for path in cleanup:
+            shutil.rmtree(path, ignore_errors=True)
+
+    config = config.as_dict()
+    config.update(iterations=iterations, concurrency=concurrency,
+                  memory_iterations=memory_iterations)
+    return {
+        'python': sys.version.split()[0],
+        'config': config,
+        'results': results,
+    }
+
+
+def compare(report, baseline):
+    """Print ratios current/baseline of the latency and throughput."""
+    for name, result in sorted(report['results'].items()):
+        base = baseline.get('results', {}).get(name)
+        if not base or 'skipped' in result or 'skipped' in base:
+            continue
+        ratios = []
+        for key in ('p50_ms', 'p99_ms', 'throughput'):
+            if result.get(key) and base.get(key):
+                ratios.append('{} x{:.2f}'.format(
+                    key, result[key] / base[key]))
+        print('{:40} {}'.format(name, ', '.join(ratios)))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Offline benchmark of the API clients.')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='fake server latency, ms')
+    parser.add_argument('--payload', type=int, default=100,
+                        help='number of items in the responses')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='fraction of the error responses')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--memory-iterations', type=int, default=20,
+                        help='calls of the untimed memory pass, 0 -- skip')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--only', nargs='+',
+                        choices=[client for client, _ in SETUPS])
+    parser.add_argument('--output', help='write JSON results to the file')
+    parser.add_argument('--compare', help='JSON results of the baseline')
+    args = parser.parse_args()
+
+    config = fakeservers.FakeConfig(
+        latency=args.latency / 1000.0,
+        payload=args.payload,
+        error_rate=args.error_rate,
+        seed=args.seed
+    )
+    report = run(config, args.iterations, args.concurrency,
+                 args.memory_iterations, args.only)
+
+    content = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(content)
+    else:
+        print(content)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
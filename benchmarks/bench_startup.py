@@ -0,0 +1,72 @@
+"""Startup time of googleapi.Client: cold vs warm construction.
+
+cold -- empty discovery cache, no shared services in the process.
+disk -- discovery documents from the cache directory.
+build -- services built from the cached documents, as every Client
+         did without shared services.
+warm -- credentials and services shared in the process,
+        Client builds only own authorized Http.
+
+Usage:
+    python benchmarks/bench_startup.py JSON_KEY_FILE [SCOPE ...]
+
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import googleapi  # noqa: E402
+
+
+DEFAULT_SCOPES = [
+    'https://www.googleapis.com/auth/drive',
+    'https://www.googleapis.com/auth/spreadsheets',
+]
+REPEAT = 5
+
+
+def construct(json_key_file, scopes, discovery_dir):
+    started = time.time()
+    googleapi.Client(json_key_file, scopes, discovery_dir=discovery_dir)
+    return time.time() - started
+
+
+def main(json_key_file, scopes):
+    discovery_dir = tempfile.mkdtemp(prefix='googleapi-discovery-')
+    result = {'cold': [], 'disk': [], 'build': [], 'warm': []}
+    try:
+        for _ in range(REPEAT):
+            shutil.rmtree(discovery_dir, ignore_errors=True)
+            googleapi.clear_services()
+            result['cold'].append(
+                construct(json_key_file, scopes, discovery_dir))
+
+            googleapi.clear_services()
+            result['disk'].append(
+                construct(json_key_file, scopes, discovery_dir))
+
+            started = time.time()
+            googleapi.build_services(discovery_dir)
+            result['build'].append(time.time() - started)
+
+            result['warm'].append(
+                construct(json_key_file, scopes, discovery_dir))
+    finally:
+        shutil.rmtree(discovery_dir, ignore_errors=True)
+
+    print(json.dumps(
+        dict((name, {'min': min(times), 'avg': sum(times) / len(times)})
+             for name, times in result.items()),
+        indent=2, sort_keys=True))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    main(sys.argv[1], sys.argv[2:] or DEFAULT_SCOPES)
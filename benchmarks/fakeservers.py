@@ -0,0 +1,336 @@
+"""Local stand-in HTTP server of the APIs used by the clients.
+
+One threaded server emulates by path prefix:
+    /oxr/          -- Open Exchange Rates (latest.json, historical/*.json)
+    /uptimerobot/  -- UptimeRobot getMonitors
+    /virustotal/   -- VirusTotal url/report, url/scan
+    /graph/        -- Facebook Graph API
+    /drive/        -- Google Drive v3 files.list
+    /sheets/       -- Google Sheets v4 spreadsheets, values
+
+Behaviour is set by FakeConfig:
+    latency -- seconds of delay of every response.
+    payload -- number of items in the responses (rates, monitors,
+               insights, files, rows).
+    error_rate -- fraction of the responses with HTTP 500 error.
+
+"""
+import json
+import random
+import re
+import threading
+import time
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlparse, parse_qs
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlparse, parse_qs
+
+
+SHEET_COLUMNS = 5
+
+
+class FakeConfig(object):
+
+    def __init__(self, latency=0.0, payload=100, error_rate=0.0, seed=None):
+        self.latency = latency
+        self.payload = payload
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+
+    def as_dict(self):
+        return {
+            'latency': self.latency,
+            'payload': self.payload,
+            'error_rate': self.error_rate,
+        }
+
+
+def currencies(count):
+    """List of the fake currency codes (USD, EUR first)."""
+    codes = ['USD', 'EUR']
+    i = 0
+    while len(codes) < count:
+        codes.append('C{:02d}'.format(i))
+        i += 1
+    return codes[:count]
+
+
+def oxr(config, path, query, body):
+    return {
+        'base': 'USD',
+        'timestamp': int(time.time()),
+        'rates': dict(
+            (code, 1.0 + i / 100.0)
+            for i, code in enumerate(currencies(max(config.payload, 2)))
+        ),
+    }
+
+
+def uptimerobot(config, path, query, body):
+    statuses = ['0', '1', '2', '8', '9']
+    return {
+        'stat': 'ok',
+        'monitors': {'monitor': [
+            {
+                'id': str(i),
+                'friendlyname': 'monitor-{}'.format(i),
+                'status': statuses[i % len(statuses)],
+            }
+            for i in range(config.payload)
+        ]},
+    }
+
+
+def virustotal(config, path, query, body):
+    return {
+        'response_code': 1,
+        'resource': body.get('resource', [''])[0],
+        'positives': 0,
+        'total': config.payload,
+        'scans': dict(
+            ('engine-{}'.format(i), {'detected': False, 'result': 'clean'})
+            for i in range(config.payload)
+        ),
+    }
+
+
+def graph(config, path, query, body):
+    if path.endswith('/insights'):
+        return {'data': [
+            {'spend': '{:.2f}'.format(i + 0.5)} for i in range(config.payload)
+        ]}
+    return {'adaccounts': {'data': [
+        {
+            'account_id': str(i),
+            'currency': 'USD',
+            'age': 10,
+            'amount_spent': '1000',
+        }
+        for i in range(config.payload)
+    ]}}
+
+
+def drive(config, path, query, body):
+    return {'files': [
+        {
+            'id': 'file-{}'.format(i),
+            'name': 'file-{}'.format(i),
+            'parents': ['folder'],
+            'mimeType': 'application/vnd.google-apps.spreadsheet',
+            'webViewLink': 'http://localhost/file-{}'.format(i),
+        }
+        for i in range(config.payload)
+    ]}
+
+
+def sheets(config, path, query, body):
+    if path.endswith('/values:batchUpdate'):
+        rows = sum(len(data['values']) for data in body['data'])
+        cells = sum(
+            len(row) for data in body['data'] for row in data['values'])
+        return {'totalUpdatedRows': rows, 'totalUpdatedCells': cells}
+    if path.endswith('/values:batchGet'):
+        major = query.get('majorDimension', ['ROWS'])[0]
+        if major == 'COLUMNS':
+            values = [
+                [row * SHEET_COLUMNS + column for row in range(config.payload)]
+                for column in range(SHEET_COLUMNS)
+            ]
+        else:
+            values = [
+                [row * SHEET_COLUMNS + column
+                 for column in range(SHEET_COLUMNS)]
+                for row in range(config.payload)
+            ]
+        return {'valueRanges': [
+            {'range': range_, 'majorDimension': major, 'values': values}
+            for range_ in query.get('ranges', [])
+        ]}
+    if path.endswith(':batchUpdate'):
+        return {'replies': [{} for _ in body.get('requests', [])]}
+    return {'sheets': [{'properties': {
+        'sheetId': 0,
+        'title': 'Sheet1',
+        'gridProperties': {
+            'rowCount': config.payload, 'columnCount': SHEET_COLUMNS},
+    }}]}
+
+
+ROUTES = [
+    (re.compile(r'^/oxr/'), oxr),
+    (re.compile(r'^/uptimerobot/'), uptimerobot),
+    (re.compile(r'^/virustotal/'), virustotal),
+    (re.compile(r'^/graph/'), graph),
+    (re.compile(r'^/drive/'), drive),
+    (re.compile(r'^/sheets/'), sheets),
+]
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.respond()
+
+    def do_POST(self):
+        self.respond()
+
+    def respond(self):
+        config = self.server.config
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        content_type = self.headers.get('Content-Type') or ''
+        if raw and 'json' in content_type:
+            body = json.loads(raw.decode('utf-8'))
+        else:
+            body = parse_qs(raw.decode('utf-8'))
+
+        if config.latency:
+            time.sleep(config.latency)
+
+        for route, handler in ROUTES:
+            if route.match(url.path):
+                break
+        else:
+            return self.send_json(404, {'error': True, 'message': 'Not Found'})
+
+        if config.error_rate and config.random.random() < config.error_rate:
+            return self.send_json(
+                500, {'error': True, 'message': 'Fake server error'})
+
+        self.send_json(200, handler(config, url.path, query, body))
+
+    def send_json(self, status, data):
+        content = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(content)))
+        self.send_header('facebook-api-version', 'v2.8')
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class FakeServer(ThreadingMixIn, HTTPServer):
+
+    """Fake API server on the random local port, run in a daemon thread."""
+
+    daemon_threads = True
+
+    def __init__(self, config=None, host='127.0.0.1', port=0):
+        HTTPServer.__init__(self, (host, port), FakeHandler)
+        self.config = config or FakeConfig()
+        self.thread = None
+
+    @property
+    def url(self):
+        return 'http://{}:{}'.format(*self.server_address[:2])
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self.thread.join()
+
+
+def discovery_documents(url):
+    """Minimal discovery documents of Google Drive v3 and Sheets v4.
+
+    Only methods used by googleapi hot calls, root url is the fake server.
+
+    """
+    def method(id_, path, http_method, params, body=None, response=None):
+        parameters = {}
+        for name, kind, location in params:
+            parameters[name] = {
+                'type': kind,
+                'location': location,
+                'required': location == 'path',
+            }
+            if name == 'ranges':
+                parameters[name]['repeated'] = True
+        desc = {
+            'id': id_,
+            'path': path,
+            'httpMethod': http_method,
+            'parameters': parameters,
+            'parameterOrder': [
+                name for name, _, location in params if location == 'path'],
+        }
+        if body:
+            desc['request'] = {'$ref': body}
+        if response:
+            desc['response'] = {'$ref': response}
+        return desc
+
+    schemas = dict(
+        (name, {'id': name, 'type': 'object'})
+        for name in ('Object', 'Request')
+    )
+    common = {
+        'kind': 'discovery#restDescription',
+        'discoveryVersion': 'v1',
+        'protocol': 'rest',
+        'rootUrl': url + '/',
+        'batchPath': 'batch',
+        'parameters': {
+            'fields': {'type': 'string', 'location': 'query'},
+        },
+        'schemas': schemas,
+    }
+
+    drive = dict(common, name='drive', version='v3', servicePath='drive/v3/')
+    drive['resources'] = {'files': {'methods': {
+        'list': method('drive.files.list', 'files', 'GET', [
+            ('q', 'string', 'query'),
+            ('pageSize', 'integer', 'query'),
+            ('pageToken', 'string', 'query'),
+        ], response='Object'),
+    }}}
+
+    sheets = dict(common, name='sheets', version='v4', servicePath='sheets/')
+    spreadsheet_id = ('spreadsheetId', 'string', 'path')
+    sheets['resources'] = {'spreadsheets': {
+        'methods': {
+            'get': method(
+                'sheets.spreadsheets.get', 'v4/spreadsheets/{spreadsheetId}',
+                'GET', [spreadsheet_id], response='Object'),
+            'batchUpdate': method(
+                'sheets.spreadsheets.batchUpdate',
+                'v4/spreadsheets/{spreadsheetId}:batchUpdate',
+                'POST', [spreadsheet_id], body='Request', response='Object'),
+        },
+        'resources': {'values': {'methods': {
+            'batchUpdate': method(
+                'sheets.spreadsheets.values.batchUpdate',
+                'v4/spreadsheets/{spreadsheetId}/values:batchUpdate',
+                'POST', [spreadsheet_id], body='Request', response='Object'),
+            'batchGet': method(
+                'sheets.spreadsheets.values.batchGet',
+                'v4/spreadsheets/{spreadsheetId}/values:batchGet',
+                'GET', [
+                    spreadsheet_id,
+                    ('ranges', 'string', 'query'),
+                    ('majorDimension', 'string', 'query'),
+                    ('valueRenderOption', 'string', 'query'),
+                    ('dateTimeRenderOption', 'string', 'query'),
+                ], response='Object'),
+        }}},
+    }}
+
+    return {'drive.v3': drive, 'sheets.v4': sheets}
@@ -2,6 +2,7 @@ import requests
 
 from django.utils.translation import ugettext_lazy as _
 
+from instrumentation import measure
 from models import FBExchange
 
 OPEN_EXCHANGE_URL = 'https://openexchangerates.org/api/'
@@ -65,7 +66,13 @@ class ExchangeAPI(object):
         return rates
 
     def get_api_rates(self, url, undefined_currencies):
-        response = requests.get(url).json()
+        endpoint = 'latest' if '/latest.json' in url else 'historical'
+        with measure('exchange', endpoint, sent=len(url)) as call:
+            response = requests.get(url)
+            call.received = len(response.content)
+            response = response.json()
+            if 'error' in response:
+                call.error = 'api_error'
 
         if 'error' in response:
             rates = {}
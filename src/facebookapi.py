@@ -1,6 +1,7 @@
 import datetime
 import json
 import random
+import re
 import urllib
 import urllib2
 
@@ -16,6 +17,14 @@ from facebook import (
 )
 
 from fburllib import BindableOpenerDirector
+from instrumentation import measure
+
+
+def graph_endpoint(path):
+    """Path of the Graph API without version and object IDs."""
+    path = path.replace(FACEBOOK_GRAPH_URL, '')
+    path = re.sub(r'^v\d+\.\d+/', '', path)
+    return re.sub(r'\b(act_)?\d+\b', '{id}', path)
 
 
 class FacebookAPI(GraphAPI):
@@ -129,7 +138,10 @@ class FacebookAPI(GraphAPI):
 
     def get_version(self):
         path = '{}{}/me'.format(FACEBOOK_GRAPH_URL, self.version)
-        response = self.open_url(path)
+        with measure('facebook', graph_endpoint(path)) as call:
+            response = self.open_url(path)
+            call.sent = len(response.geturl())
+            call.received = len(response.read())
         info = response.info()
         version = info.getheader('facebook-api-version').replace('v', '')
         if version not in VALID_API_VERSIONS:
@@ -152,10 +164,15 @@ class FacebookAPI(GraphAPI):
 
     def request(self, path, args=None):
         """Fetches the given path in the Graph API."""
-        response = self.open_url(path, args)
-        result_text = response.read()
+        with measure('facebook', graph_endpoint(path)) as call:
+            response = self.open_url(path, args)
+            result_text = response.read()
+            call.sent = len(response.geturl())
+            call.received = len(result_text)
+            result_parse = parse_qs(result_text) if result_text else {}
+            if not result_text or 'error' in result_parse:
+                call.error = 'api_error'
         if result_text:
-            result_parse = parse_qs(result_text)
             if 'error' in result_parse:
                 raise GraphAPIError(result_parse['error'])
             elif 'access_token' in result_parse:
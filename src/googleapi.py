@@ -1,17 +1,61 @@
+import contextlib
 import copy
-
-from apiclient.discovery import build
-from googleapiclient.errors import Error
+import io
+import json
+import os
+import re
+import stat
+import threading
+import time
+
+from apiclient.discovery import build_from_document, DISCOVERY_URI
+from googleapiclient.errors import Error, HttpError
 from oauth2client.service_account import ServiceAccountCredentials
 
 from httplib2 import Http
 
+from multiprocessing.pool import ThreadPool
+
 from django.utils.translation import ugettext_lazy as _
 
+from instrumentation import measure
+from sheetcolumns import to_column
+from sheetdiff import column_letter, diff_rectangles
+from sheetutils import (
+    BatchBuffer, BATCH_BUFFER_MAX_SIZE, PUT_ROWS_CHUNK_CELLS,
+    PUT_ROWS_CHUNK_ROWS, iter_chunks
+)
+
 
 SPREADSHEET_TYPE = 'application/vnd.google-apps.spreadsheet'
 FOLDER_TYPE = 'application/vnd.google-apps.folder'
 
+# Max number of the calls in one Google Drive batch request
+DRIVE_BATCH_SIZE = 100
+
+# Google Drive list page size
+DRIVE_PAGE_SIZE = 1000
+
+# Seconds between updates of FolderIndex from the Google Drive changes feed
+FOLDER_INDEX_REFRESH_INTERVAL = 60
+
+FILE_FIELDS = 'id,name,parents,mimeType,webViewLink'
+
+# Per-user directory of the discovery documents '<api>.<version>.json'
+DISCOVERY_CACHE_DIR = os.path.join(
+    os.path.expanduser('~'), '.cache', 'googleapi-discovery')
+
+# rootUrl of the trusted discovery documents
+DISCOVERY_ROOT_URL_RE = re.compile(
+    r'^https://([a-z0-9-]+\.)*googleapis\.com/$')
+
+# Default number of the threads of Client.map
+CLIENT_WORKERS = 8
+
+# HTTP statuses of the retried API requests and first retry delay, seconds
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+RETRY_DELAY = 1.0
+
 
 class DublicationSpreadsheet(Error):
     pass
@@ -29,22 +73,274 @@ class ObjectNotFound(Error):
     pass
 
 
+class DiscoveryDocumentError(Error):
+    pass
+
+
+def a1_range(title, cells):
+    """Return A1 notation range of the cells of the sheet."""
+    return "'{}'!{}".format(title, cells)
+
+
+def is_private_path(path):
+    """Whether the path is owned by the current user (or root)
+    and isn't writable by group and others."""
+    if not hasattr(os, 'getuid'):
+        return os.path.exists(path)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    return st.st_uid in (0, os.getuid()) and \
+        not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+def check_discovery_document(content):
+    """Return text of the discovery document with trusted rootUrl."""
+    if isinstance(content, bytes):
+        content = content.decode('utf-8')
+    try:
+        root_url = json.loads(content).get('rootUrl', '')
+    except (ValueError, AttributeError):
+        raise DiscoveryDocumentError(_('Invalid discovery document.'))
+    if not DISCOVERY_ROOT_URL_RE.match(root_url):
+        raise DiscoveryDocumentError(
+            _('Untrusted rootUrl "{}" of the discovery document.'.format(
+                root_url)))
+    return content
+
+
+def load_discovery_document(api, version, cache_dir=DISCOVERY_CACHE_DIR):
+    """Return discovery document of the API.
+
+    Document is read from the file '<cache_dir>/<api>.<version>.json'
+    (cache or bundled with application) if the directory and the file
+    are private (see 'is_private_path'), otherwise it's fetched from
+    Google APIs Discovery Service and stored in the cache directory
+    (created with mode 0700). rootUrl of the document must match
+    DISCOVERY_ROOT_URL_RE.
+
+    """
+    path = os.path.join(cache_dir, '{}.{}.json'.format(api, version))
+    if is_private_path(cache_dir) and is_private_path(path):
+        with io.open(path, encoding='utf-8') as f:
+            return check_discovery_document(f.read())
+
+    url = DISCOVERY_URI.format(api=api, apiVersion=version)
+    resp, content = Http().request(url)
+    if resp.status >= 400:
+        raise HttpError(resp, content, uri=url)
+    content = check_discovery_document(content)
+
+    try:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir, 0o700)
+        if is_private_path(cache_dir):
+            tmp_path = '{}.{}'.format(path, os.getpid())
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+                         0o600)
+            with io.open(fd, 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.rename(tmp_path, path)
+    except (IOError, OSError):
+        # cache is optional
+        pass
+    return content
+
+
+def build_services(discovery_dir=DISCOVERY_CACHE_DIR):
+    """Return drive and sheet services built from the discovery documents.
+
+    Services are built with not authorized Http: Client passes
+    its own authorized Http to every request (see 'Client.execute').
+
+    """
+    return tuple(
+        build_from_document(
+            load_discovery_document(api, version, discovery_dir),
+            http=Http())
+        for api, version in (('drive', 'v3'), ('sheets', 'v4'))
+    )
+
+
+_credentials = {}
+_services = {}
+_services_lock = threading.Lock()
+
+
+def get_services(json_key_file, scopes=None,
+                 discovery_dir=DISCOVERY_CACHE_DIR, credentials=None):
+    """Return credentials, authorized http, drive and sheet services.
+
+    Credentials of the key file and scopes, and services of the discovery
+    directory (see 'build_services') are built once and shared between
+    calls, services hold no credentials. Every call gets own authorized
+    Http. Ready 'credentials' may be passed instead of the key file.
+
+    """
+    with _services_lock:
+        if credentials is None:
+            if isinstance(scopes, (list, tuple)):
+                key = (os.path.abspath(json_key_file), tuple(scopes))
+            else:
+                key = (os.path.abspath(json_key_file), scopes)
+            credentials = _credentials.get(key)
+            if credentials is None:
+                credentials = _credentials[key] = \
+                    ServiceAccountCredentials.from_json_keyfile_name(
+                        json_key_file,
+                        scopes=scopes
+                    )
+
+        key = os.path.abspath(discovery_dir)
+        services = _services.get(key)
+        if services is None:
+            services = _services[key] = build_services(discovery_dir)
+
+    drive_service, sheet_service = services
+    http = credentials.authorize(Http())
+    return credentials, http, drive_service, sheet_service
+
+
+_token_lock = threading.Lock()
+
+
+def clear_services():
+    """Drop the shared objects of 'get_services'."""
+    with _services_lock:
+        _credentials.clear()
+        _services.clear()
+
+
 class Client(object):
 
-    def __init__(self, json_key_file, scopes=None, folder=None, template=None):
+    """Google Drive and Google Sheets API client.
+
+    With 'threadsafe' every thread executes API requests by own authorized
+    Http (httplib2.Http isn't thread-safe), access token is refreshed
+    once for all threads. Otherwise all requests go through one Http
+    of the Client. Credentials and services are shared with other
+    Clients (see 'get_services').
+
+    Ready oauth2client 'credentials' may be passed instead of
+    the key file (json_key_file=None).
+
+    Failed (RETRY_STATUSES) API requests are retried up to 'num_retries'
+    times with exponential backoff.
+
+    'map' runs by the pool of 'workers' threads kept by the Client,
+    call 'close' to stop it.
+
+    """
+
+    def __init__(self, json_key_file, scopes=None, folder=None, template=None,
+                 discovery_dir=DISCOVERY_CACHE_DIR, threadsafe=False,
+                 credentials=None, num_retries=0, workers=CLIENT_WORKERS):
         self.folder = folder
         self.template = template
-        self.credentials = ServiceAccountCredentials.from_json_keyfile_name(
-            json_key_file,
-            scopes=scopes
-        )
-        self.http = self.credentials.authorize(Http())
-        self.drive_service = build('drive', 'v3', http=self.http)
-        self.sheet_service = build('sheets', 'v4', http=self.http)
+        self.folder_indexes = {}
+        self.threadsafe = threadsafe
+        self.num_retries = num_retries
+        self.workers = workers
+        self.pool = None
+        self.pool_lock = threading.Lock()
+        self.local = threading.local()
+        (self.credentials, self.default_http,
+         self.drive_service, self.sheet_service) = get_services(
+            json_key_file, scopes, discovery_dir, credentials)
+
+    @property
+    def http(self):
+        """Authorized Http for API requests of the current thread."""
+        if not self.threadsafe:
+            return self.default_http
+        http = getattr(self.local, 'http', None)
+        if http is None:
+            http = self.local.http = self.credentials.authorize(Http())
+        return http
+
+    def refresh_token(self):
+        """Refresh expired access token once for all threads."""
+        credentials = self.credentials
+        if credentials.access_token is None or \
+                credentials.access_token_expired:
+            with _token_lock:
+                if credentials.access_token is None or \
+                        credentials.access_token_expired:
+                    credentials.refresh(Http())
+
+    def execute(self, request):
+        """Execute API request (or batch request) by Http of the thread.
+
+        Request is recorded by instrumentation as client 'googleapi',
+        endpoint -- API method ID (e.g. 'sheets.spreadsheets.batchUpdate'),
+        with the number of retries. Batch requests aren't retried:
+        callbacks of their calls would be repeated.
+
+        """
+        if self.threadsafe:
+            self.refresh_token()
+        method_id = getattr(request, 'methodId', None)
+        if method_id is None:
+            with measure('googleapi', 'batch'):
+                return request.execute(http=self.http)
+
+        sent = len(request.uri) + len(request.body or '')
+        with measure('googleapi', method_id, sent=sent) as call:
+
+            def callback(response):
+                call.received = int(response.get('content-length') or 0)
+
+            request.add_response_callback(callback)
+            while True:
+                try:
+                    return request.execute(http=self.http)
+                except HttpError as err:
+                    if call.retries >= self.num_retries or \
+                            int(err.resp.status) not in RETRY_STATUSES:
+                        raise
+                time.sleep(RETRY_DELAY * 2 ** call.retries)
+                call.retries += 1
+
+    def map(self, func, items):
+        """Call func(item) for every item by the pool of 'workers' threads.
+
+        For example, refresh many spreadsheets in parallel:
+            client.map(lambda title: client.open(title).sheet('Data')
+                       .put_rows(2, rows[title]), titles)
+
+        The pool is created by the first call and reused by the next ones,
+        so every thread keeps its authorized Http and connections.
+        Not 'threadsafe' client and 'map' called from func
+        call func sequentially.
+
+        Return list of results in order of items.
+
+        """
+        if not self.threadsafe or self.workers < 2 or \
+                getattr(self.local, 'worker', False):
+            return [func(item) for item in items]
+        with self.pool_lock:
+            if self.pool is None:
+                self.pool = ThreadPool(self.workers, self.init_worker)
+            pool = self.pool
+        return pool.map(func, items)
+
+    def init_worker(self):
+        self.local.worker = True
+
+    def close(self):
+        """Stop the threads of 'map', next 'map' starts new ones."""
+        with self.pool_lock:
+            pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.close()
+            pool.join()
 
     def get_file_properties(self, id_):
         """Return File/Folder properties by ID"""
-        return self.drive_service.files().get(fileId=id_, fields='*').execute()
+        return self.execute(
+            self.drive_service.files().get(fileId=id_, fields='*'))
 
     def get_file_extended_properties(self, id_):
         """Return File/Folder extended properties by ID
@@ -76,6 +372,16 @@ class Client(object):
                   folder=None, query=None):
         """Search or filter files in Google drive.
 
+        Return list of the File Class instances, see 'iter_files'.
+
+        """
+        return list(self.iter_files(name=name, mime_type=mime_type,
+                                    folder=folder, query=query))
+
+    def iter_files(self, name=None, mime_type=None,
+                   folder=None, query=None):
+        """Search or filter files in Google drive page by page.
+
         Search files with query combining one or more search clauses.
 
         Keyword arguments:
@@ -88,7 +394,7 @@ class Client(object):
         Query string allows to use wildcards (*, ?).
         See Google Drive APIs REST Search for Files.
 
-        Return list of the File Class instances.
+        Yield File Class instances.
 
         """
         q = ''
@@ -106,22 +412,56 @@ class Client(object):
         if query:
             q += " and {}".format(self.escape(query))
 
-        response = self.drive_service.files().list(
-            q=q, fields='files(id,name,parents,mimeType,webViewLink)'
-        ).execute()
+        page_token = None
+        while True:
+            response = self.execute(self.drive_service.files().list(
+                q=q, pageSize=DRIVE_PAGE_SIZE, pageToken=page_token,
+                fields='nextPageToken,files({})'.format(FILE_FIELDS)
+            ))
+
+            for f in response.get('files', []):
+                yield File(self, f)
 
-        return [File(self, f) for f in response['files']]
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
 
     def escape(self, arg):
         return arg.replace('"', '\"').replace("'", "\'")
 
     def get_spreadsheets(self, name=None, folder=None,
                          name_filter=None, query=None):
-        """Get List of Spreadsheet instances."""
-        files = self.get_files(mime_type=SPREADSHEET_TYPE, folder=folder,
-                               name=name, query=query)
+        """Get List of Spreadsheet instances.
+
+        Search by name in the indexed folder (see 'index_folder')
+        uses FolderIndex instead of API query.
+
+        """
+        index = self.folder_indexes.get(folder)
+        if index is not None and name and not query:
+            files = index.lookup(name, mime_type=SPREADSHEET_TYPE)
+        else:
+            files = self.get_files(mime_type=SPREADSHEET_TYPE, folder=folder,
+                                   name=name, query=query)
         return [Spreadsheet(f) for f in files]
 
+    def index_folder(self, folder=None,
+                     refresh_interval=FOLDER_INDEX_REFRESH_INTERVAL):
+        """Create FolderIndex of the folder (default: self.folder).
+
+        Name lookups of 'open', 'get_spreadsheets' and 'open_or_create'
+        with folder argument in the indexed folder need no API call.
+
+        Return FolderIndex instance.
+
+        """
+        folder = folder or self.folder
+        if not folder:
+            raise ValueError('Folder for index is not defined.')
+        index = FolderIndex(self, folder, refresh_interval)
+        self.folder_indexes[folder] = index
+        return index
+
     def get_spreadsheet_properties(self, spreadsheetId):
         """ Get the metadata for a spreadsheet by ID.
 
@@ -136,10 +476,10 @@ class Client(object):
         namedRanges[] --  The named ranges defined in a spreadsheet.
 
         """
-        return self.sheet_service.spreadsheets().get(
+        return self.execute(self.sheet_service.spreadsheets().get(
             spreadsheetId=spreadsheetId,
             fields='sheets.properties'
-        ).execute()
+        ))
 
     def open(self, title, folder=None):
         """Return Spreadsheet instance."""
@@ -155,13 +495,17 @@ class Client(object):
 
         return spreadsheets[0]
 
-    def open_or_create(self, title):
+    def open_or_create(self, title, folder=None):
         """Open existing spreadsheet or create new.
 
+        Search in all folders, or only in 'folder' if it's given (then
+        FolderIndex of the folder is used, see 'index_folder').
+        New spreadsheet is created in 'folder' (default: self.folder).
+
         Return Spreadsheet instance.
 
         """
-        spreadsheets = self.get_spreadsheets(title)
+        spreadsheets = self.get_spreadsheets(title, folder=folder)
 
         if len(spreadsheets) > 1:
             raise DublicationSpreadsheet(
@@ -171,7 +515,7 @@ class Client(object):
         if spreadsheets:
             return spreadsheets[0]
 
-        return self.create(title)
+        return self.create(title, folder=folder)
 
     def create(self, title, spreadsheetId=None, folder=None):
         """Create new spreadsheet.
@@ -190,27 +534,63 @@ class Client(object):
         spreadsheetId = spreadsheetId or self.template
         folder = folder or self.folder
 
-        response = self.drive_service.files().copy(
+        response = self.execute(self.drive_service.files().copy(
             fileId=spreadsheetId,
             body={'name': title, 'parents': [folder]},
-            fields='id,name,parents,mimeType,webViewLink'
-        ).execute()
+            fields=FILE_FIELDS
+        ))
 
-        return Spreadsheet(File(self, response))
+        file_ = File(self, response)
+        if folder in self.folder_indexes:
+            self.folder_indexes[folder].add(file_)
+        return Spreadsheet(file_)
 
     def create_spreadsheets(self, titles):
         """Copy template spreadsheet to work folder by list of titles."""
         spreadsheets = [self.create_spreadsheet(title) for title in titles]
         return spreadsheets
 
+    def get_bin_files(self):
+        """Spreadsheets in the service account's root(bin) folder."""
+        return [file_ for file_ in self.get_files(mime_type=SPREADSHEET_TYPE)
+                if not file_.parents]
+
     def empty_bin(self):
         """Delete spreadsheets in the service account's root(bin) folder."""
-        for file_ in filter(lambda f: not f.parents,
-                            self.get_files(mime_type=SPREADSHEET_TYPE)):
-            self.delete(file_.id)
+        self.delete_files([file_.id for file_ in self.get_bin_files()])
 
     def delete(self, spreadsheetId):
-        self.drive_service.files().delete(fileId=spreadsheetId).execute()
+        self.execute(self.drive_service.files().delete(fileId=spreadsheetId))
+        for index in self.folder_indexes.values():
+            index.remove(spreadsheetId)
+
+    def delete_files(self, ids):
+        """Delete files by list of IDs.
+
+        Deletes are sent by Google Drive batch requests of DRIVE_BATCH_SIZE
+        calls. The first error (if any) is raised after all batches.
+
+        """
+        errors = []
+
+        def callback(request_id, response, exception):
+            if exception is not None:
+                errors.append(exception)
+                return
+            for index in self.folder_indexes.values():
+                index.remove(request_id)
+
+        ids = list(ids)
+        for i in range(0, len(ids), DRIVE_BATCH_SIZE):
+            batch = self.drive_service.new_batch_http_request(
+                callback=callback)
+            for id_ in ids[i:i + DRIVE_BATCH_SIZE]:
+                batch.add(self.drive_service.files().delete(fileId=id_),
+                          request_id=id_)
+            self.execute(batch)
+
+        if errors:
+            raise errors[0]
 
     def create_template_spreadsheet(
             self, title, sheet_titles, folder, super_template):
@@ -222,14 +602,20 @@ class Client(object):
         folder -- folder for the new template.
         super_template -- spreadsheet with the prototype sheet.
 
+        The number of API calls doesn't depend on the number of sheets:
+        one batch of deletes, copy of the super template and one
+        batchUpdate duplicating the prototype sheet with titles and
+        hidden flags.
+
         """
         sourceId = super_template
-        folder = folder
 
-        # delete destination file if exists
-        for file_ in self.get_files(name=title, folder=folder):
-            self.delete(file_.id)
-        self.empty_bin()
+        # delete destination file if exists and empty bin
+        ids = [file_.id for file_ in self.get_files(name=title, folder=folder)]
+        ids += [file_.id for file_ in self.get_bin_files()
+                if file_.id not in ids]
+        self.delete_files(ids)
+
         # create new destination file
         dest = self.create(title, spreadsheetId=sourceId, folder=folder)
 
@@ -241,31 +627,31 @@ class Client(object):
                     'sheetId': sheet.id
                 }
             })
-        dest.batch_update(requests)
 
-        # copy and rename sheets
-        sheetId = dest.sheets[0].id
-        for sh_title in sheet_titles:
-            # copy sheet
-            sheet = self.sheet_service.spreadsheets().sheets().copyTo(
-                spreadsheetId=dest.id,
-                sheetId=sheetId,
-                body={'destinationSpreadsheetId': dest.id},
-                fields='sheetId,title'
-            ).execute()
-
-            # rename new sheet
-            sheetId = sheet.get('sheetId')
-            requests = []
+        # duplicate prototype sheet with new titles and hide copies
+        prototype = dest.sheets[0]
+        sheetId = max(sheet.id for sheet in dest.sheets)
+        sheets = [prototype]
+        for index, sh_title in enumerate(sheet_titles, 1):
+            sheetId += 1
+            requests.append({
+                'duplicateSheet': {
+                    'sourceSheetId': prototype.id,
+                    'insertSheetIndex': index,
+                    'newSheetId': sheetId,
+                    'newSheetName': sh_title,
+                }
+            })
             requests.append({
                 'updateSheetProperties': {
-                    'properties': {
-                        'sheetId': sheetId, 'title': sh_title, 'hidden': True,
-                    },
-                    'fields': 'title, hidden'
+                    'properties': {'sheetId': sheetId, 'hidden': True},
+                    'fields': 'hidden'
                 }
             })
-            dest.batch_update(requests)
+            sheets.append(
+                Sheet(dest, sheetId, sh_title, True, prototype.row_count))
+        dest.batch_update(requests)
+        dest.sheets = sheets
 
         return dest
 
@@ -295,12 +681,105 @@ class File(object):
         )
 
 
+class FolderIndex(object):
+
+    """In-memory index name -> Files of the Google Drive folder.
+
+    Built by the full listing of the folder and updated incrementally
+    from the Google Drive changes feed, not more often than once
+    per 'refresh_interval' seconds (None -- only by 'refresh' call).
+    Safe to use from several threads.
+
+    """
+
+    CHANGES_FIELDS = (
+        'nextPageToken,newStartPageToken,'
+        'changes(fileId,removed,file({}))'.format(FILE_FIELDS)
+    )
+
+    def __init__(self, client, folder,
+                 refresh_interval=FOLDER_INDEX_REFRESH_INTERVAL):
+        self.client = client
+        self.folder = folder
+        self.refresh_interval = refresh_interval
+        self.lock = threading.RLock()
+        self.build()
+
+    def build(self):
+        """Full listing of the folder."""
+        with self.lock:
+            # token before listing, changes during listing will be replayed
+            self.page_token = self.client.execute(
+                self.client.drive_service.changes().getStartPageToken()
+            )['startPageToken']
+            self.files = {}
+            self.names = {}
+            for file_ in self.client.iter_files(folder=self.folder):
+                self.add(file_)
+            self.refreshed = time.time()
+
+    def add(self, file_):
+        with self.lock:
+            self.remove(file_.id)
+            self.files[file_.id] = file_
+            self.names.setdefault(file_.name, {})[file_.id] = file_
+
+    def remove(self, id_):
+        with self.lock:
+            file_ = self.files.pop(id_, None)
+            if file_ is not None:
+                names = self.names[file_.name]
+                names.pop(id_, None)
+                if not names:
+                    del self.names[file_.name]
+
+    def refresh(self):
+        """Apply changes from the Google Drive changes feed."""
+        with self.lock:
+            page_token = self.page_token
+            while page_token:
+                response = self.client.execute(
+                    self.client.drive_service.changes().list(
+                        pageToken=page_token, pageSize=DRIVE_PAGE_SIZE,
+                        fields=self.CHANGES_FIELDS
+                    )
+                )
+
+                for change in response.get('changes', []):
+                    id_ = change.get('fileId')
+                    if id_ is None:
+                        continue
+                    file_ = change.get('file')
+                    if change.get('removed') or not file_ or \
+                            self.folder not in file_.get('parents', []):
+                        self.remove(id_)
+                    else:
+                        self.add(File(self.client, file_))
+
+                if 'newStartPageToken' in response:
+                    self.page_token = response['newStartPageToken']
+                page_token = response.get('nextPageToken')
+            self.refreshed = time.time()
+
+    def lookup(self, name, mime_type=None):
+        """Return list of the Files by name."""
+        with self.lock:
+            if self.refresh_interval is not None and \
+                    time.time() - self.refreshed >= self.refresh_interval:
+                self.refresh()
+            return [
+                file_ for file_ in self.names.get(name, {}).values()
+                if mime_type is None or file_.mimeType == mime_type
+            ]
+
+
 class Spreadsheet(object):
 
     """ A class for a spreadsheet object."""
 
     def __init__(self, file_):
         self.file = file_
+        self.local = threading.local()
         self.root_folder = self.client.folder in self.file.parents
 
         spreadsheet = self.client.get_spreadsheet_properties(self.file.id)
@@ -310,7 +789,8 @@ class Spreadsheet(object):
                 self,
                 s['properties']['sheetId'],
                 s['properties']['title'],
-                s['properties'].get('hidden', False)
+                s['properties'].get('hidden', False),
+                s['properties'].get('gridProperties', {}).get('rowCount')
             )
             for s in spreadsheet['sheets']
         ]
@@ -347,12 +827,87 @@ class Spreadsheet(object):
 
         Arg: requests for execution.
 
+        Inside 'deferred' block requests are queued and None is returned.
+
         """
         if requests:
-            return self.client.sheet_service.spreadsheets().batchUpdate(
+            if self.buffer is not None:
+                return self.buffer.add_requests(requests)
+            return self.execute_batch_update(requests)
+
+    def execute_batch_update(self, requests):
+        return self.client.execute(
+            self.client.sheet_service.spreadsheets().batchUpdate(
                 spreadsheetId=self.file.id,
                 body={'requests': requests}
-            ).execute()
+            )
+        )
+
+    def values_batch_update(self, data,
+                            value_input_option='USER_ENTERED',
+                            max_rows=PUT_ROWS_CHUNK_ROWS, max_cells=None):
+        """Call Google Sheets API Method spreadsheets.values.batchUpdate.
+
+        Arg: data -- list of ValueRange for writing.
+
+        Inside 'deferred' block data are queued and None is returned,
+        queued blocks of the rows are merged up to 'max_rows' rows and
+        'max_cells' cells.
+
+        """
+        if data:
+            if self.buffer is not None:
+                return self.buffer.add_values(
+                    data, value_input_option, max_rows, max_cells)
+            return self.execute_values_batch_update(data, value_input_option)
+
+    def execute_values_batch_update(self, data, value_input_option):
+        body = {
+            'valueInputOption': value_input_option,
+            'data': data,
+        }
+        return self.client.execute(
+            self.client.sheet_service.spreadsheets().values()
+            .batchUpdate(spreadsheetId=self.file.id, body=body)
+        )
+
+    @property
+    def buffer(self):
+        """BatchBuffer of the current thread's 'deferred' block or None."""
+        return getattr(self.local, 'buffer', None)
+
+    @buffer.setter
+    def buffer(self, value):
+        self.local.buffer = value
+
+    @contextlib.contextmanager
+    def deferred(self, max_size=BATCH_BUFFER_MAX_SIZE,
+                 max_cells=PUT_ROWS_CHUNK_CELLS):
+        """Queue update requests of the spreadsheet and send them on exit.
+
+        Structural (batch_update) and value (values_batch_update) requests
+        are queued in order, compatible ones are merged and flushed
+        by the fewest API calls on exit of the block, when 'max_size'
+        queued requests are reached or before queued values would exceed
+        'max_cells' cells. If the block raises an exception,
+        not flushed requests are discarded.
+        Nested blocks use the buffer of the outer one. Buffer is
+        per thread: requests of the other threads aren't queued.
+
+            with spreadsheet.deferred():
+                sheet.insert_rows(1, 10)
+                sheet.put_rows(2, rows)
+
+        """
+        if self.buffer is not None:
+            yield self.buffer
+            return
+        buffer = self.buffer = BatchBuffer(self, max_size, max_cells)
+        try:
+            yield buffer
+        finally:
+            self.buffer = None
+        buffer.flush()
 
     def update_sheet_property(self, titles, property_, value):
         """Update property of the sheet[s.
@@ -386,6 +941,72 @@ class Spreadsheet(object):
             requests.append({'updateSheetProperties': prop})
         self.batch_update(requests)
 
+    def batch_get(self, ranges, major_dimension='ROWS',
+                  value_render_option='FORMATTED_VALUE',
+                  date_time_render_option='SERIAL_NUMBER'):
+        """Call Google Sheets API Method spreadsheets.values.batchGet.
+
+        Read many ranges (possibly of the different sheets) by one call.
+
+        Arg: ranges -- list of A1 ranges "'Title'!A1:C10" or
+                       tuples (sheet title, cells).
+        Keyword arguments:
+        major_dimension -- 'ROWS' or 'COLUMNS'.
+        value_render_option -- 'FORMATTED_VALUE', 'UNFORMATTED_VALUE'
+                               or 'FORMULA'.
+        date_time_render_option -- 'SERIAL_NUMBER' or 'FORMATTED_STRING'.
+
+        Return list of values (list of rows or columns) in order of ranges.
+
+        """
+        ranges = [
+            a1_range(*range_) if isinstance(range_, tuple) else range_
+            for range_ in ranges
+        ]
+        if not ranges:
+            return []
+        response = self.client.execute(
+            self.client.sheet_service.spreadsheets().values().batchGet(
+                spreadsheetId=self.file.id,
+                ranges=ranges,
+                majorDimension=major_dimension,
+                valueRenderOption=value_render_option,
+                dateTimeRenderOption=date_time_render_option
+            )
+        )
+        return [
+            value_range.get('values', [])
+            for value_range in response.get('valueRanges', [])
+        ]
+
+    def get_columns(self, ranges, dtypes=None, as_array=False):
+        """Read ranges by one call as typed columns.
+
+        Values are unformatted: numbers as numbers, dates as serial numbers,
+        so there is no parsing of the formatted strings.
+
+        Arg: ranges -- see 'batch_get'.
+        Keyword arguments:
+        dtypes -- dict column index -> type (callable or NumPy dtype)
+                  for the columns of every range, see 'to_column'.
+        as_array -- return columns as NumPy arrays.
+
+        Return list (in order of ranges) of the lists of columns, all
+        columns of the range have the same length.
+
+        """
+        dtypes = dtypes or {}
+        result = []
+        for columns in self.batch_get(
+                ranges, major_dimension='COLUMNS',
+                value_render_option='UNFORMATTED_VALUE'):
+            length = max([len(column) for column in columns] or [0])
+            result.append([
+                to_column(column, length, dtypes.get(index), as_array)
+                for index, column in enumerate(columns)
+            ])
+        return result
+
     def sheet(self, title):
         """ Return Sheet instance by title"""
         sheets = [sheet for sheet in self.sheets if sheet.title == title]
@@ -398,11 +1019,12 @@ class Sheet(object):
 
     """A class for sheet object."""
 
-    def __init__(self, spreadsheet, idSheet, title, hidden):
+    def __init__(self, spreadsheet, idSheet, title, hidden, row_count=None):
         self.spreadsheet = spreadsheet
         self.id = idSheet
         self.title = title
         self.hidden = hidden
+        self.row_count = row_count
 
     def rows_range(self, start, count):
         return {
@@ -428,43 +1050,142 @@ class Sheet(object):
                 'inheritFromBefore': before
             }
         },))
+        if self.row_count is not None:
+            self.row_count += count
 
     def delete_rows(self, start, count=1):
         """Delete 'count' rows starting with the 'start' position."""
         self.spreadsheet.batch_update(({
             'deleteDimension': {'range': self.rows_range(start-1, count)}},))
+        if self.row_count is not None:
+            self.row_count -= count
 
-    def put_rows(self, start, values):
+    def put_rows(self, start, values, chunk_rows=PUT_ROWS_CHUNK_ROWS,
+                 chunk_cells=PUT_ROWS_CHUNK_CELLS):
         """Insert values by rows
 
-        Insert a two-dimensional array of values starting col:1 row:start
+        Insert a two-dimensional array of values starting col:1 row:start.
+        Values may be any iterable of rows (e.g. a generator), rows are
+        written as contiguous blocks 'Title'!first:last, one
+        values.batchUpdate call per block, without materializing
+        the whole iterable.
+
+        Keyword arguments:
+        chunk_rows -- max number of the rows in one block.
+        chunk_cells -- max number of the cells in one block.
+
+        Return dict with the summary of the update:
+        totalUpdatedRows, totalUpdatedCells -- totals of the API responses.
+        rows -- number of the rows sent.
+        elapsed -- seconds spent.
+        rowsPerSecond -- throughput.
+        Inside Spreadsheet.deferred block rows are queued and not counted
+        in the API totals.
 
         """
-        value_range = []
+        started = time.time()
+        result = {'totalUpdatedRows': 0, 'totalUpdatedCells': 0, 'rows': 0}
         row = start
-        for value in values:
-            sheet_range = "'{}'!{}:{}".format(self.title, row, row)
-            value_range.append({
+        for chunk in iter_chunks(values, chunk_rows, chunk_cells):
+            sheet_range = "'{}'!{}:{}".format(
+                self.title, row, row + len(chunk) - 1)
+            response = self.spreadsheet.values_batch_update([{
                 'range': sheet_range,
-                'values': [value],
+                'values': chunk,
                 'majorDimension': 'ROWS'
-            })
-            row += 1
+            }], max_rows=chunk_rows, max_cells=chunk_cells)
+            row += len(chunk)
+            result['rows'] += len(chunk)
+            if response:
+                result['totalUpdatedRows'] += response.get(
+                    'totalUpdatedRows', 0)
+                result['totalUpdatedCells'] += response.get(
+                    'totalUpdatedCells', 0)
+
+        result['elapsed'] = time.time() - started
+        result['rowsPerSecond'] = (
+            result['rows'] / result['elapsed'] if result['elapsed'] else 0.0)
+        return result
 
-        body = {
-          'valueInputOption': 'USER_ENTERED',
-          'data': value_range,
+    def sync_rows(self, start, values):
+        """Write only changed cells of the table starting col:1 row:start.
+
+        The table is the sheet data from the row 'start' to the end
+        in the columns of 'values' (up to its widest row), cells to the
+        right aren't read or changed. Its current values (formulas
+        as formulas, unformatted numbers) are compared with 'values'
+        cell by cell and only changed rectangular ranges are written,
+        cells of the shorter rows and None values are cleared.
+        Extra rows of the table are deleted (whole sheet rows),
+        rows are inserted if the grid is too small. Requests are sent
+        by Spreadsheet.deferred batches, changed rectangles are split
+        by rows as in 'put_rows'. Requests queued by the outer
+        'deferred' block are flushed before the table is read.
+
+        Return dict:
+        cellsWritten -- number of the written cells.
+        cellsSkipped -- number of the unchanged cells.
+        rowsInserted, rowsDeleted -- number of the inserted/deleted rows.
+
+        """
+        values = [list(row) for row in values]
+        width = max([len(row) for row in values] or [1]) or 1
+
+        # the table must be read with queued changes applied
+        if self.spreadsheet.buffer is not None:
+            self.spreadsheet.buffer.flush()
+
+        if self.row_count is not None and start > self.row_count:
+            current = []
+        else:
+            current = self.spreadsheet.batch_get(
+                [a1_range(self.title, 'A{}:{}'.format(
+                    start, column_letter(width - 1)))],
+                value_render_option='FORMULA',
+                date_time_render_option='FORMATTED_STRING'
+            )[0]
+
+        result = {
+            'cellsWritten': 0, 'cellsSkipped': 0,
+            'rowsInserted': 0, 'rowsDeleted': 0
         }
-        return (
-            self.spreadsheet.client.sheet_service.spreadsheets().values()
-            .batchUpdate(spreadsheetId=self.spreadsheet.id, body=body)
-            .execute()
-        )
+        rectangles, cells = diff_rectangles(current, values)
+
+        with self.spreadsheet.deferred():
+            if len(current) > len(values):
+                result['rowsDeleted'] = len(current) - len(values)
+                self.delete_rows(start + len(values), result['rowsDeleted'])
+
+            last_row = start - 1 + len(values)
+            if self.row_count is not None and last_row > self.row_count:
+                result['rowsInserted'] = last_row - self.row_count
+                self.insert_rows(self.row_count, result['rowsInserted'],
+                                 before=self.row_count > 0)
+
+            data = []
+            for row, column, rows in rectangles:
+                first_row = start + row
+                for chunk in iter_chunks(rows, PUT_ROWS_CHUNK_ROWS,
+                                         PUT_ROWS_CHUNK_CELLS):
+                    data.append({
+                        'range': a1_range(self.title, '{}{}:{}{}'.format(
+                            column_letter(column), first_row,
+                            column_letter(column + len(chunk[0]) - 1),
+                            first_row + len(chunk) - 1)),
+                        'values': chunk,
+                        'majorDimension': 'ROWS'
+                    })
+                    first_row += len(chunk)
+                result['cellsWritten'] += len(rows) * len(rows[0])
+            self.spreadsheet.values_batch_update(data)
+
+        result['cellsSkipped'] = cells - result['cellsWritten']
+        return result
 
     def get_cells_values(self, cells):
-        cells = "'{}'!{}".format(self.title, cells)
-        return (
-            self.spreadsheet.client.sheet_service.spreadsheets().values()
-            .get(spreadsheetId=self.spreadsheet.id, range=cells).execute()
-            .get('values', [])
-        )
+        cells = a1_range(self.title, cells)
+        client = self.spreadsheet.client
+        return client.execute(
+            client.sheet_service.spreadsheets().values()
+            .get(spreadsheetId=self.spreadsheet.id, range=cells)
+        ).get('values', [])
@@ -0,0 +1,217 @@
+"""Request instrumentation of the API clients.
+
+Every client wraps its API calls:
+
+    with measure('uptimerobot', 'getMonitors', sent=len(url)) as call:
+        response = requests.get(url)
+        call.received = len(response.content)
+
+and 'registry' collects per client and endpoint the number of calls,
+errors and retries, bytes sent/received and latency histogram:
+
+    registry.snapshot()         -- dict of the metrics.
+    registry.prometheus_text()  -- Prometheus text exposition format.
+    registry.add_hook(func)     -- func(client, endpoint, latency, sent,
+                                        received, retries, error)
+                                   is called after every request,
+                                   its exceptions are logged.
+
+"""
+import bisect
+import logging
+import threading
+import timeit
+
+
+logger = logging.getLogger(__name__)
+
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0, 30.0)
+
+
+class Metric(object):
+
+    """Counters of the one client endpoint."""
+
+    __slots__ = ('calls', 'errors', 'retries', 'sent', 'received',
+                 'latency_sum', 'buckets')
+
+    def __init__(self, size):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.sent = 0
+        self.received = 0
+        self.latency_sum = 0.0
+        self.buckets = [0] * size
+
+
+class Registry(object):
+
+    """Thread-safe storage of the request metrics."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.enabled = True
+        self.hooks = []
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self.hooks.remove(hook)
+
+    def record(self, client, endpoint, latency, sent=0, received=0,
+               retries=0, error=None):
+        """Record one request, 'error' -- name of the error or None."""
+        if not self.enabled:
+            return
+        index = bisect.bisect_left(self.buckets, latency)
+        with self.lock:
+            metric = self.metrics.get((client, endpoint))
+            if metric is None:
+                metric = self.metrics[(client, endpoint)] = Metric(
+                    len(self.buckets) + 1)
+            metric.calls += 1
+            metric.retries += retries
+            metric.sent += sent
+            metric.received += received
+            metric.latency_sum += latency
+            metric.buckets[index] += 1
+            if error is not None:
+                metric.errors += 1
+        for hook in self.hooks:
+            try:
+                hook(client, endpoint, latency, sent, received, retries, error)
+            except Exception:
+                # hook must not break the API call
+                logger.exception('Instrumentation hook %r failed', hook)
+
+    def reset(self):
+        with self.lock:
+            self.metrics = {}
+
+    def snapshot(self):
+        """Return dict client -> endpoint -> metrics.
+
+        'latency_buckets' is list of (upper bound, count) pairs,
+        not cumulative, the last bound is None (+Inf).
+
+        """
+        with self.lock:
+            items = [
+                (key, (metric.calls, metric.errors, metric.retries,
+                       metric.sent, metric.received, metric.latency_sum,
+                       list(metric.buckets)))
+                for key, metric in self.metrics.items()
+            ]
+        result = {}
+        bounds = list(self.buckets) + [None]
+        for (client, endpoint), values in items:
+            calls, errors, retries, sent, received, latency_sum, buckets = \
+                values
+            result.setdefault(client, {})[endpoint] = {
+                'calls': calls,
+                'errors': errors,
+                'retries': retries,
+                'bytes_sent': sent,
+                'bytes_received': received,
+                'latency_sum': latency_sum,
+                'latency_buckets': list(zip(bounds, buckets)),
+            }
+        return result
+
+    def prometheus_text(self, prefix='api_client'):
+        """Return metrics in Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        series = [
+            ('requests_total', 'counter', 'Number of the requests.',
+             'calls'),
+            ('errors_total', 'counter', 'Number of the failed requests.',
+             'errors'),
+            ('retries_total', 'counter', 'Number of the retries.',
+             'retries'),
+            ('sent_bytes_total', 'counter', 'Bytes sent.', 'bytes_sent'),
+            ('received_bytes_total', 'counter', 'Bytes received.',
+             'bytes_received'),
+        ]
+        items = sorted(
+            (client, endpoint, metric)
+            for client, endpoints in snapshot.items()
+            for endpoint, metric in endpoints.items()
+        )
+
+        lines = []
+        for name, kind, help_, key in series:
+            name = '{}_{}'.format(prefix, name)
+            lines.append('# HELP {} {}'.format(name, help_))
+            lines.append('# TYPE {} {}'.format(name, kind))
+            for client, endpoint, metric in items:
+                lines.append('{}{{{}}} {}'.format(
+                    name, labels(client, endpoint), metric[key]))
+
+        name = '{}_request_duration_seconds'.format(prefix)
+        lines.append('# HELP {} Request latency.'.format(name))
+        lines.append('# TYPE {} histogram'.format(name))
+        for client, endpoint, metric in items:
+            label = labels(client, endpoint)
+            count = 0
+            for bound, value in metric['latency_buckets']:
+                count += value
+                lines.append('{}_bucket{{{},le="{}"}} {}'.format(
+                    name, label, '+Inf' if bound is None else repr(bound),
+                    count))
+            lines.append('{}_sum{{{}}} {!r}'.format(
+                name, label, metric['latency_sum']))
+            lines.append('{}_count{{{}}} {}'.format(
+                name, label, metric['calls']))
+        return '\n'.join(lines) + '\n'
+
+
+def labels(client, endpoint):
+    def escape(value):
+        return value.replace('\\', '\\\\').replace('"', '\\"').replace(
+            '\n', '\\n')
+    return 'client="{}",endpoint="{}"'.format(escape(client), escape(endpoint))
+
+
+registry = Registry()
+
+
+class measure(object):
+
+    """Context manager recording the request to the registry.
+
+    Set 'received', 'retries' of the call inside the block; 'error' is set
+    by the exception raised from the block or may be set explicitly.
+
+    """
+
+    __slots__ = ('client', 'endpoint', 'sent', 'received', 'retries',
+                 'error', 'registry', 'started')
+
+    def __init__(self, client, endpoint, sent=0, registry=registry):
+        self.client = client
+        self.endpoint = endpoint
+        self.sent = sent
+        self.received = 0
+        self.retries = 0
+        self.error = None
+        self.registry = registry
+
+    def __enter__(self):
+        self.started = timeit.default_timer()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None and self.error is None:
+            self.error = exc_type.__name__
+        self.registry.record(
+            self.client, self.endpoint,
+            timeit.default_timer() - self.started,
+            self.sent, self.received, self.retries, self.error)
+        return False
@@ -0,0 +1,73 @@
+"""Typed columns of the values read by Spreadsheet.get_columns.
+
+NumPy is imported only when arrays are requested.
+
+"""
+import numbers
+import sys
+
+
+# Types of the NumPy dtype names ('int64', 'f8'); str is unicode in Python 3
+STRING_TYPES = (str, type(u''))
+
+
+def is_numpy_dtype(dtype):
+    """Whether 'dtype' is NumPy dtype: numpy.dtype, its name or NumPy
+    scalar type. Other dtypes of 'to_column' (int, float, str,
+    decimal.Decimal, functions) are callables converting the values."""
+    if isinstance(dtype, STRING_TYPES):
+        return True
+    numpy = sys.modules.get('numpy')
+    if numpy is None:
+        # without imported NumPy there are no NumPy objects
+        return False
+    return isinstance(dtype, numpy.dtype) or (
+        isinstance(dtype, type) and issubclass(dtype, numpy.generic))
+
+
+def to_column(values, length, dtype=None, as_array=False):
+    """Convert list of the cells values to the typed column.
+
+    Column is padded by None (NaN for NumPy) up to 'length',
+    empty cells are None.
+    dtype -- callable for the not empty values or, with as_array,
+             NumPy dtype (see 'is_numpy_dtype').
+    as_array -- return numpy.ndarray. Callable 'dtype' is applied before,
+                then (and without dtype) array is float64 for real numbers,
+                bool for booleans and object for others. NumPy dtype of
+                the column with empty cells must be float, complex
+                or object, otherwise ValueError is raised.
+
+    """
+    column = [None if v == '' else v for v in values]
+    column += [None] * (length - len(column))
+
+    if not as_array or (dtype is not None and not is_numpy_dtype(dtype)):
+        if dtype is not None:
+            column = [None if v is None else dtype(v) for v in column]
+        if not as_array:
+            return column
+        dtype = None
+
+    import numpy
+
+    if dtype is None:
+        present = [v for v in column if v is not None]
+        if present and all(isinstance(v, bool) for v in present) and \
+                len(present) == len(column):
+            dtype = numpy.dtype(bool)
+        elif all(isinstance(v, numbers.Real) and not isinstance(v, bool)
+                 for v in present):
+            dtype = numpy.dtype(numpy.float64)
+        else:
+            dtype = numpy.dtype(object)
+    else:
+        dtype = numpy.dtype(dtype)
+        if dtype.kind not in 'fcO' and any(v is None for v in column):
+            raise ValueError(
+                'Column with empty cells can not be of dtype {}.'.format(
+                    dtype))
+
+    if dtype.kind in 'fc':
+        column = [numpy.nan if v is None else v for v in column]
+    return numpy.array(column, dtype=dtype)
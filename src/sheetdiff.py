@@ -0,0 +1,91 @@
+"""Diff of the local table and the sheet values for Sheet.sync_rows."""
+import numbers
+
+
+def column_letter(index):
+    """Return letter of the column by 0-based index: 0 -> A, 26 -> AA."""
+    letters = ''
+    index += 1
+    while index:
+        index, rest = divmod(index - 1, 26)
+        letters = chr(ord('A') + rest) + letters
+    return letters
+
+
+def cell_text(value):
+    """Text of the cell value for comparison of the local and sheet values."""
+    if value is None:
+        return u''
+    if isinstance(value, bool):
+        return u'TRUE' if value else u'FALSE'
+    if isinstance(value, float):
+        if value.is_integer():
+            value = int(value)
+        else:
+            # format() keeps only 12 significant digits in Python 2
+            return u'{!r}'.format(value)
+    if isinstance(value, bytes):
+        value = value.decode('utf-8')
+    return u'{}'.format(value)
+
+
+def cells_equal(a, b):
+    """Whether the local and sheet values of the cell are equal,
+    numbers are compared numerically, other values by 'cell_text'."""
+    if isinstance(a, numbers.Number) and isinstance(b, numbers.Number) and \
+            not isinstance(a, bool) and not isinstance(b, bool):
+        return a == b
+    return cell_text(a) == cell_text(b)
+
+
+def diff_rectangles(current, values):
+    """Compare table 'current' with 'values' (lists of rows).
+
+    Changed cells of every row are grouped in runs of the adjacent
+    columns, equal runs of the consecutive rows are joined to rectangles.
+    Cells missing in 'values' but present in 'current' and None values
+    are cleared ('').
+
+    Return list of the rectangles (row, column, rows of new values),
+    row and column are 0-based, and number of the compared cells.
+
+    """
+    rectangles = []
+    active = {}
+    cells = 0
+    for i, row in enumerate(values):
+        old = current[i] if i < len(current) else []
+        width = max(len(row), len(old))
+        cells += width
+        # None would be skipped by values.batchUpdate, '' clears the cell
+        new = [
+            '' if j >= len(row) or row[j] is None else row[j]
+            for j in range(width)
+        ]
+        changed = [
+            not cells_equal(new[j], old[j] if j < len(old) else '')
+            for j in range(width)
+        ]
+
+        runs = []
+        j = 0
+        while j < width:
+            if changed[j]:
+                first = j
+                while j < width and changed[j]:
+                    j += 1
+                runs.append((first, j))
+            else:
+                j += 1
+
+        next_active = {}
+        for first, last in runs:
+            rectangle = active.get((first, last))
+            if rectangle is None:
+                rectangle = (i, first, [])
+                rectangles.append(rectangle)
+            rectangle[2].append(new[first:last])
+            next_active[(first, last)] = rectangle
+        active = next_active
+
+    return rectangles, cells
@@ -0,0 +1,227 @@
+"""Write helpers of googleapi without API calls: chunks of the rows,
+merging of the queued requests and BatchBuffer of Spreadsheet.deferred."""
+import copy
+import re
+
+
+# Size bounds of the one block of rows written by Sheet.put_rows
+PUT_ROWS_CHUNK_ROWS = 5000
+PUT_ROWS_CHUNK_CELLS = 100000
+
+# Max number of the queued requests in BatchBuffer before flush
+BATCH_BUFFER_MAX_SIZE = 500
+
+ROWS_RANGE_RE = re.compile(r"^(?P<sheet>'.*')!(?P<first>\d+):(?P<last>\d+)$")
+
+
+def iter_chunks(rows, max_rows, max_cells):
+    """Split iterable of rows into lists bounded by rows and cells count."""
+    chunk = []
+    cells = 0
+    for row in rows:
+        row = list(row)
+        if chunk and (len(chunk) >= max_rows or
+                      cells + len(row) > max_cells):
+            yield chunk
+            chunk = []
+            cells = 0
+        chunk.append(row)
+        cells += len(row)
+    if chunk:
+        yield chunk
+
+
+def deep_update(dest, source):
+    """Recursive update of the dict 'dest' by dict 'source'."""
+    for key, value in source.items():
+        if isinstance(value, dict) and isinstance(dest.get(key), dict):
+            deep_update(dest[key], value)
+        else:
+            dest[key] = copy.deepcopy(value)
+    return dest
+
+
+def merge_request(prev, new):
+    """Merge two spreadsheets.batchUpdate requests into one.
+
+    Merged are:
+    updateSheetProperties of the same sheet;
+    insertDimension inside or next to the previously inserted range;
+    deleteDimension covering the position of the previously deleted range.
+
+    Return merged request or None if requests are not compatible.
+
+    """
+    if 'updateSheetProperties' in prev and 'updateSheetProperties' in new:
+        prev_prop = prev['updateSheetProperties']
+        new_prop = new['updateSheetProperties']
+        if prev_prop['properties'].get('sheetId') != \
+                new_prop['properties'].get('sheetId'):
+            return None
+        fields = [f.strip() for f in prev_prop['fields'].split(',')]
+        new_fields = [f.strip() for f in new_prop['fields'].split(',')]
+        if '*' in fields or '*' in new_fields:
+            return None
+        fields += [f for f in new_fields if f not in fields]
+        properties = deep_update(
+            copy.deepcopy(prev_prop['properties']), new_prop['properties'])
+        return {'updateSheetProperties': {
+            'properties': properties, 'fields': ','.join(fields)}}
+
+    for kind in ('insertDimension', 'deleteDimension'):
+        if kind in prev and kind in new:
+            break
+    else:
+        return None
+
+    prev_range = prev[kind]['range']
+    new_range = new[kind]['range']
+    same = all(
+        prev_range.get(key) == new_range.get(key)
+        for key in ('sheetId', 'dimension')
+    )
+    if not same or None in (prev_range.get('startIndex'),
+                            prev_range.get('endIndex'),
+                            new_range.get('startIndex'),
+                            new_range.get('endIndex')):
+        return None
+    prev_count = prev_range['endIndex'] - prev_range['startIndex']
+    new_count = new_range['endIndex'] - new_range['startIndex']
+
+    if kind == 'insertDimension':
+        if prev[kind].get('inheritFromBefore') != \
+                new[kind].get('inheritFromBefore'):
+            return None
+        if not (prev_range['startIndex'] <= new_range['startIndex'] <=
+                prev_range['endIndex']):
+            return None
+        start = prev_range['startIndex']
+    else:
+        if not (new_range['startIndex'] <= prev_range['startIndex'] <=
+                new_range['endIndex']):
+            return None
+        start = new_range['startIndex']
+
+    merged = copy.deepcopy(prev)
+    merged[kind]['range']['startIndex'] = start
+    merged[kind]['range']['endIndex'] = start + prev_count + new_count
+    return merged
+
+
+def value_range_cells(value_range):
+    """Number of the cells of the ValueRange."""
+    return sum(len(row) for row in value_range.get('values', []))
+
+
+def merge_value_range(prev, new, max_rows=PUT_ROWS_CHUNK_ROWS,
+                      max_cells=PUT_ROWS_CHUNK_CELLS):
+    """Merge two adjacent ValueRange blocks of the rows 'Title'!first:last.
+
+    Merged block is bounded by 'max_rows' rows and 'max_cells' cells.
+
+    Return merged ValueRange or None if ranges are not compatible.
+
+    """
+    prev_match = ROWS_RANGE_RE.match(prev['range'])
+    new_match = ROWS_RANGE_RE.match(new['range'])
+    if not prev_match or not new_match:
+        return None
+    if prev_match.group('sheet') != new_match.group('sheet'):
+        return None
+    if prev.get('majorDimension', 'ROWS') != 'ROWS' or \
+            new.get('majorDimension', 'ROWS') != 'ROWS':
+        return None
+    first = int(prev_match.group('first'))
+    last = int(prev_match.group('last'))
+    if last - first + 1 != len(prev['values']) or \
+            int(new_match.group('first')) != last + 1:
+        return None
+    if len(prev['values']) + len(new['values']) > max_rows or \
+            value_range_cells(prev) + value_range_cells(new) > max_cells:
+        return None
+    return {
+        'range': '{}!{}:{}'.format(
+            prev_match.group('sheet'), first, new_match.group('last')),
+        'values': prev['values'] + new['values'],
+        'majorDimension': 'ROWS'
+    }
+
+
+class BatchBuffer(object):
+
+    """Write-behind buffer of the spreadsheet update requests.
+
+    Queue structural requests (spreadsheets.batchUpdate) and value ranges
+    (spreadsheets.values.batchUpdate) in order of addition, merge compatible
+    neighbours and flush them by the fewest API calls: one call per run of
+    the requests of the same kind.
+
+    The buffer is flushed as soon as it holds 'max_size' requests or before
+    a value range would take it over 'max_cells' cells, so no call is
+    bigger than these limits (except a single bigger value range).
+
+    """
+
+    def __init__(self, spreadsheet, max_size=BATCH_BUFFER_MAX_SIZE,
+                 max_cells=PUT_ROWS_CHUNK_CELLS):
+        self.spreadsheet = spreadsheet
+        self.max_size = max_size
+        self.max_cells = max_cells
+        self.segments = []
+        self.size = 0
+        self.cells = 0
+
+    def __len__(self):
+        return self.size
+
+    def add_requests(self, requests):
+        self.add(('requests', None), requests, merge_request)
+
+    def add_values(self, data, value_input_option,
+                   max_rows=PUT_ROWS_CHUNK_ROWS, max_cells=None):
+        """Queue ValueRanges, merged blocks are bounded by 'max_rows' rows
+        and 'max_cells' (not more than buffer's max_cells) cells."""
+        if max_cells is None or max_cells > self.max_cells:
+            max_cells = self.max_cells
+
+        def merge(prev, new):
+            return merge_value_range(prev, new, max_rows, max_cells)
+
+        self.add(('values', value_input_option), data, merge,
+                 value_range_cells)
+
+    def add(self, kind, items, merge, cells=None):
+        for item in items:
+            item_cells = cells(item) if cells is not None else 0
+            if self.cells and self.cells + item_cells > self.max_cells:
+                self.flush()
+
+            if not self.segments or self.segments[-1][0] != kind:
+                self.segments.append((kind, []))
+            queue = self.segments[-1][1]
+            merged = merge(queue[-1], item) if queue else None
+            if merged is not None:
+                queue[-1] = merged
+            else:
+                queue.append(item)
+                self.size += 1
+            self.cells += item_cells
+
+            if self.size >= self.max_size:
+                self.flush()
+
+    def flush(self):
+        """Send queued requests, return list of the API responses."""
+        segments = self.segments
+        self.segments = []
+        self.size = 0
+        self.cells = 0
+        responses = []
+        for (kind, option), items in segments:
+            if kind == 'requests':
+                responses.append(self.spreadsheet.execute_batch_update(items))
+            else:
+                responses.append(
+                    self.spreadsheet.execute_values_batch_update(
+                        items, option))
+        return responses
@@ -1,5 +1,7 @@
 import requests
 
+from instrumentation import measure
+
 
 UPTIMEROBOT_API_URL = 'https://api.uptimerobot.com/getMonitors?' + \
                     'apiKey={}&noJsonCallback=1&format=json'
@@ -24,20 +26,25 @@ class UptimeRobotAPI(object):
 
     def get_monitors_states(self):
         url = UPTIMEROBOT_API_URL.format(self.api_key)
-        try:
-            response = requests.get(url)
-        except (
-                    requests.exceptions.RequestException,
-                    requests.exceptions.BaseHTTPError
-                ) as err:
-            raise UptimeRobotAPIError(err.message)
-
-        if response.status_code != 200:
-            raise UptimeRobotAPIError(
-                'Http Error {}. {}'.format(
-                    response.status_code, response.text))
-
-        response = response.json()
+        with measure('uptimerobot', 'getMonitors', sent=len(url)) as call:
+            try:
+                response = requests.get(url)
+            except (
+                        requests.exceptions.RequestException,
+                        requests.exceptions.BaseHTTPError
+                    ) as err:
+                raise UptimeRobotAPIError(err.message)
+            call.received = len(response.content)
+            if response.status_code != 200:
+                call.error = 'http_{}'.format(response.status_code)
+                raise UptimeRobotAPIError(
+                    'Http Error {}. {}'.format(
+                        response.status_code, response.text))
+
+            response = response.json()
+            if response.get('stat') != 'ok':
+                call.error = 'api_error'
+
         stat = response.get('stat')
         if stat != 'ok':
             error = response.get('message', 'UptimerobotAPI unknown error')
@@ -1,5 +1,7 @@
 import requests
 
+from instrumentation import measure
+
 
 VIRUSTOTAL_API_URL = 'https://www.virustotal.com/vtapi/v2/url/'
 
@@ -16,19 +18,26 @@ class VirusTotalAPI(object):
         resource = 'http://{}/'.format(domain)
         data = {'apikey': self.api_key, 'resource': resource, 'url': resource}
         url = '{}{}'.format(VIRUSTOTAL_API_URL, method)
-        try:
-            response = requests.post(url, data)
-        except (
-            requests.exceptions.RequestException,
-            requests.exceptions.BaseHTTPError
-        ) as err:
-            raise VirusTotalAPIError(err.message)
-        if response.status_code != 200:
-            raise VirusTotalAPIError(
-                '{} Http Error {}. {}'.format(
-                    domain, response.status_code, response.text))
-
-        response = response.json()
+        with measure('virustotal', method) as call:
+            try:
+                response = requests.post(url, data)
+            except (
+                requests.exceptions.RequestException,
+                requests.exceptions.BaseHTTPError
+            ) as err:
+                raise VirusTotalAPIError(err.message)
+            call.sent = len(url) + len(response.request.body or '')
+            call.received = len(response.content)
+            if response.status_code != 200:
+                call.error = 'http_{}'.format(response.status_code)
+                raise VirusTotalAPIError(
+                    '{} Http Error {}. {}'.format(
+                        domain, response.status_code, response.text))
+
+            response = response.json()
+            if response.get('response_code', 0) < 1:
+                call.error = 'api_error'
+
         response_code = response.get('response_code', 0)
         if response_code < 1:
             error = response.get('verbose_msg', 'Unknown error')
@@ -0,0 +1,296 @@
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+try:
+    import googleapi
+except ImportError as err:
+    googleapi = None
+    IMPORT_ERROR = str(err)
+else:
+    IMPORT_ERROR = None
+
+
+SPREADSHEET = 'application/vnd.google-apps.spreadsheet'
+
+
+def file_(id_, name, parents=('folder',), mime_type=SPREADSHEET):
+    return {'id': id_, 'name': name, 'parents': list(parents),
+            'mimeType': mime_type}
+
+
+class Request(object):
+
+    """Fake API request (or resource): method name and its arguments."""
+
+    def __init__(self, method, kwargs=None):
+        self.method = method
+        self.kwargs = kwargs or {}
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return lambda **kwargs: Request(
+            '{}.{}'.format(self.method, name), kwargs)
+
+
+class Service(object):
+
+    """Fake drive and sheet services."""
+
+    def files(self):
+        return Request('files')
+
+    def changes(self):
+        return Request('changes')
+
+    def spreadsheets(self):
+        return Request('spreadsheets')
+
+
+if googleapi is not None:
+
+    class FakeClient(googleapi.Client):
+
+        """Client answering requests by the queued responses."""
+
+        def __init__(self, folder='folder', threadsafe=False, workers=4):
+            self.folder = folder
+            self.template = 'template'
+            self.folder_indexes = {}
+            self.threadsafe = threadsafe
+            self.num_retries = 0
+            self.workers = workers
+            self.pool = None
+            self.pool_lock = threading.Lock()
+            self.local = threading.local()
+            self.drive_service = self.sheet_service = Service()
+            self.requests = []
+            self.responses = {}
+
+        def respond(self, method, *responses):
+            self.responses.setdefault(method, []).extend(responses)
+
+        def execute(self, request):
+            self.requests.append(request)
+            responses = self.responses.get(request.method)
+            if responses:
+                return responses.pop(0)
+            if request.method == 'spreadsheets.get':
+                return {'sheets': []}
+            return {}
+
+        def methods(self):
+            return [request.method for request in self.requests]
+
+
+@unittest.skipIf(googleapi is None, IMPORT_ERROR)
+class FolderIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = FakeClient()
+        self.client.respond('changes.getStartPageToken',
+                            {'startPageToken': 't1'})
+        self.client.respond(
+            'files.list',
+            {'files': [file_('1', 'a'), file_('2', 'b')],
+             'nextPageToken': 'p2'},
+            {'files': [file_('3', 'a', mime_type='text/plain')]}
+        )
+        self.index = googleapi.FolderIndex(
+            self.client, 'folder', refresh_interval=None)
+
+    def names(self, name, mime_type=None):
+        return sorted(f.id for f in self.index.lookup(name, mime_type))
+
+    def test_build(self):
+        self.assertEqual(self.client.methods(), [
+            'changes.getStartPageToken', 'files.list', 'files.list'])
+        self.assertEqual(self.client.requests[2].kwargs['pageToken'], 'p2')
+        self.assertEqual(self.index.page_token, 't1')
+        self.assertEqual(self.names('a'), ['1', '3'])
+        self.assertEqual(self.names('a', SPREADSHEET), ['1'])
+        self.assertEqual(self.names('c'), [])
+
+    def test_refresh(self):
+        self.client.respond(
+            'changes.list',
+            {'changes': [
+                {'fileId': '1', 'file': file_('1', 'a', parents=['other'])},
+                {'fileId': '2', 'removed': True},
+                {'fileId': '4', 'file': file_('4', 'c')},
+                {'fileId': '5', 'file': file_('5', 'd', parents=['other'])},
+            ], 'nextPageToken': 'c2'},
+            {'changes': [
+                {'fileId': '1', 'file': file_('1', 'a')},
+                {'fileId': '3', 'file': file_('3', 'e',
+                                              mime_type='text/plain')},
+                {'kind': 'drive#change'},
+            ], 'newStartPageToken': 't2'},
+        )
+        self.index.refresh()
+        calls = [request.kwargs['pageToken']
+                 for request in self.client.requests
+                 if request.method == 'changes.list']
+        self.assertEqual(calls, ['t1', 'c2'])
+        self.assertEqual(self.index.page_token, 't2')
+        self.assertEqual(self.names('a'), ['1'])
+        self.assertEqual(self.names('b'), [])
+        self.assertEqual(self.names('c'), ['4'])
+        self.assertEqual(self.names('d'), [])
+        self.assertEqual(self.names('e'), ['3'])
+        self.assertEqual(sorted(self.index.files), ['1', '3', '4'])
+
+        self.client.respond('changes.list', {'newStartPageToken': 't3'})
+        self.index.refresh()
+        self.assertEqual(self.client.requests[-1].kwargs['pageToken'], 't2')
+        self.assertEqual(self.index.page_token, 't3')
+
+    def test_lookup_refresh_interval(self):
+        self.index.lookup('a')
+        self.assertNotIn('changes.list', self.client.methods())
+
+        self.index.refresh_interval = 0
+        self.client.respond('changes.list', {
+            'changes': [{'fileId': '6', 'file': file_('6', 'a')}],
+            'newStartPageToken': 't2'})
+        self.assertEqual(self.names('a'), ['1', '3', '6'])
+        self.assertEqual(self.client.methods().count('changes.list'), 1)
+
+
+@unittest.skipIf(googleapi is None, IMPORT_ERROR)
+class ClientIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = FakeClient()
+        self.client.respond('changes.getStartPageToken',
+                            {'startPageToken': 't1'})
+        self.client.respond('files.list', {'files': [
+            file_('1', 'a'), file_('2', 'b')]})
+        self.client.index_folder(refresh_interval=None)
+        self.client.requests = []
+
+    def test_get_spreadsheets_by_index(self):
+        spreadsheets = self.client.get_spreadsheets('a', folder='folder')
+        self.assertEqual([s.id for s in spreadsheets], ['1'])
+        self.assertEqual(self.client.open('b').id, '2')
+        self.assertIsNone(self.client.open('c'))
+        self.assertNotIn('files.list', self.client.methods())
+
+    def test_get_spreadsheets_by_query(self):
+        self.client.respond('files.list', {'files': []}, {'files': []})
+        self.client.get_spreadsheets('a')
+        self.client.get_spreadsheets('a', folder='folder', query='x')
+        self.assertEqual(self.client.methods(), ['files.list'] * 2)
+
+    def test_create_and_delete_update_index(self):
+        self.client.respond('files.copy', file_('3', 'c'))
+        self.client.respond('files.delete', None)
+        self.assertEqual(self.client.open_or_create('c', 'folder').id, '3')
+        self.assertEqual(self.client.open('c').id, '3')
+        self.client.delete('1')
+        self.assertIsNone(self.client.open('a'))
+        self.assertNotIn('files.list', self.client.methods())
+
+    def test_index_folder_without_folder(self):
+        self.assertRaises(ValueError, FakeClient(folder=None).index_folder)
+
+
+@unittest.skipIf(googleapi is None, IMPORT_ERROR)
+class MapTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = FakeClient(threadsafe=True, workers=3)
+        self.addCleanup(self.client.close)
+
+    def thread(self, item):
+        return threading.current_thread().ident
+
+    def test_pool_is_reused(self):
+        first = set(self.client.map(self.thread, range(30)))
+        pool = self.client.pool
+        second = set(self.client.map(self.thread, range(30)))
+        self.assertIs(self.client.pool, pool)
+        self.assertLessEqual(len(first | second), 3)
+        self.assertNotIn(threading.current_thread().ident, first)
+
+    def test_results_order_and_nested_map(self):
+        result = self.client.map(
+            lambda i: self.client.map(lambda j: i * j, range(3)), range(5))
+        self.assertEqual(result, [[0, i, i * 2] for i in range(5)])
+
+    def test_close(self):
+        self.client.map(self.thread, range(3))
+        self.client.close()
+        self.assertIsNone(self.client.pool)
+        self.assertEqual(self.client.map(lambda i: i, range(3)), [0, 1, 2])
+
+    def test_not_threadsafe(self):
+        client = FakeClient(workers=3)
+        self.assertEqual(set(client.map(self.thread, range(5))),
+                         set([threading.current_thread().ident]))
+        self.assertIsNone(client.pool)
+
+
+@unittest.skipIf(googleapi is None, IMPORT_ERROR)
+class SyncRowsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = FakeClient()
+        self.client.respond('spreadsheets.get', {'sheets': [{'properties': {
+            'sheetId': 1, 'title': 'T', 'gridProperties': {'rowCount': 3}}}]})
+        self.spreadsheet = googleapi.Spreadsheet(
+            googleapi.File(self.client, file_('s', 's')))
+        self.sheet = self.spreadsheet.sheets[0]
+        self.client.requests = []
+
+    def read(self, *rows):
+        self.client.respond('spreadsheets.values.batchGet', {
+            'valueRanges': [{'values': [list(row) for row in rows]}]})
+
+    def written(self):
+        return [
+            (data['range'], data['values'])
+            for request in self.client.requests
+            if request.method == 'spreadsheets.values.batchUpdate'
+            for data in request.kwargs['body']['data']
+        ]
+
+    def test_none_clears_cell(self):
+        self.read(['a', 'b'], ['c', 'd'])
+        result = self.sheet.sync_rows(2, [[None, 'b'], ['c', 'd']])
+        self.assertEqual(self.written(), [("'T'!A2:A2", [['']])])
+        self.assertEqual(result['cellsWritten'], 1)
+        self.assertEqual(result['cellsSkipped'], 3)
+
+    def test_reads_columns_of_the_table(self):
+        self.read([1, 2, 3])
+        self.sheet.sync_rows(2, [[1, 2, 3], [4]])
+        request = self.client.requests[0]
+        self.assertEqual(request.method, 'spreadsheets.values.batchGet')
+        self.assertEqual(request.kwargs['ranges'], ["'T'!A2:C"])
+
+    def test_start_after_grid(self):
+        result = self.sheet.sync_rows(5, [[1]])
+        self.assertNotIn('spreadsheets.values.batchGet',
+                         self.client.methods())
+        self.assertEqual(result['rowsInserted'], 2)
+        self.assertEqual(self.written(), [("'T'!A5:A5", [[1]])])
+
+    def test_queued_requests_are_flushed_before_read(self):
+        with self.spreadsheet.deferred():
+            self.sheet.insert_rows(1, 1)
+            self.assertEqual(self.client.methods(), [])
+            self.read(['x'], ['a'])
+            self.sheet.sync_rows(1, [['x'], ['b']])
+            self.assertEqual(self.client.methods(), [
+                'spreadsheets.batchUpdate', 'spreadsheets.values.batchGet'])
+        self.assertEqual(self.written(), [("'T'!A2:A2", [['b']])])
+
+
+if __name__ == '__main__':
+    unittest.main()
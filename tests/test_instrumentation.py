@@ -0,0 +1,56 @@
+import logging
+import os
+import sys
+import unittest
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from instrumentation import Registry, measure  # noqa: E402
+
+
+class RegistryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = Registry(buckets=(0.1, 1.0))
+        logging.disable(logging.CRITICAL)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def test_measure(self):
+        with measure('api', 'get', sent=10, registry=self.registry) as call:
+            call.received = 20
+            call.retries = 2
+        self.assertRaises(ValueError, self._fail)
+        metric = self.registry.snapshot()['api']['get']
+        self.assertEqual(metric['calls'], 2)
+        self.assertEqual(metric['errors'], 1)
+        self.assertEqual(metric['retries'], 2)
+        self.assertEqual(metric['bytes_sent'], 20)
+        self.assertEqual(metric['bytes_received'], 20)
+        self.assertIn(
+            'api_client_retries_total{client="api",endpoint="get"} 2',
+            self.registry.prometheus_text())
+
+    def _fail(self):
+        with measure('api', 'get', sent=10, registry=self.registry):
+            raise ValueError
+
+    def test_failed_hook_does_not_break_call(self):
+        calls = []
+
+        def broken(*args):
+            raise RuntimeError
+
+        self.registry.add_hook(broken)
+        self.registry.add_hook(lambda *args: calls.append(args))
+        with measure('api', 'get', registry=self.registry):
+            pass
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(calls[0][:2], ('api', 'get'))
+        self.assertEqual(self.registry.snapshot()['api']['get']['calls'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
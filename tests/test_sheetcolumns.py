@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import decimal
+import os
+import sys
+import unittest
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from sheetcolumns import is_numpy_dtype, to_column  # noqa: E402
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class IsNumpyDtypeTest(unittest.TestCase):
+
+    def test_names_are_numpy_dtypes(self):
+        self.assertTrue(is_numpy_dtype('int64'))
+        self.assertTrue(is_numpy_dtype(u'f8'))
+
+    def test_python_types_and_functions_are_callables(self):
+        for dtype in (int, float, bool, str, decimal.Decimal,
+                      lambda v: v):
+            self.assertFalse(is_numpy_dtype(dtype), dtype)
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_numpy_objects(self):
+        self.assertTrue(is_numpy_dtype(numpy.dtype('int64')))
+        self.assertTrue(is_numpy_dtype(numpy.float32))
+        self.assertFalse(is_numpy_dtype(decimal.Decimal))
+
+
+class ToColumnTest(unittest.TestCase):
+
+    def test_list(self):
+        self.assertEqual(to_column([1, '', '2'], 4, dtype=int),
+                         [1, None, 2, None])
+        self.assertEqual(to_column(['a'], 2), ['a', None])
+
+    def test_list_callable_types(self):
+        column = to_column(['1.10', ''], 2, dtype=decimal.Decimal)
+        self.assertEqual(column, [decimal.Decimal('1.10'), None])
+        self.assertIsInstance(column[0], decimal.Decimal)
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_array_callable_dtype(self):
+        column = to_column(['1', '', '2.5'], 3, dtype=float, as_array=True)
+        self.assertEqual(column.dtype, numpy.float64)
+        column = to_column(['1', '', '2.5'], 3,
+                           dtype=lambda v: float(v) * 2, as_array=True)
+        self.assertEqual(column.dtype, numpy.float64)
+        self.assertEqual(column[2], 5.0)
+        self.assertTrue(numpy.isnan(column[1]))
+        column = to_column([1, ''], 2, dtype=int, as_array=True)
+        self.assertEqual(column.dtype, numpy.float64)
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_array_python_classes(self):
+        column = to_column(['1.10', ''], 2, dtype=decimal.Decimal,
+                           as_array=True)
+        self.assertEqual(column.dtype, object)
+        self.assertEqual(list(column), [decimal.Decimal('1.10'), None])
+        column = to_column(['a', 1], 2, dtype=str, as_array=True)
+        self.assertEqual(column.dtype, object)
+        self.assertEqual(list(column), ['a', '1'])
+        column = to_column([u'ё', 1], 2, dtype=type(u''), as_array=True)
+        self.assertEqual(list(column), [u'ё', u'1'])
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_array_dtype_with_empty_cells(self):
+        self.assertEqual(
+            list(to_column([1, 2], 2, dtype='int64', as_array=True)), [1, 2])
+        self.assertRaises(ValueError, to_column, [1, ''], 2,
+                          dtype='int64', as_array=True)
+        self.assertRaises(ValueError, to_column, [1], 2,
+                          dtype=numpy.bool_, as_array=True)
+        column = to_column([1, ''], 2, dtype=numpy.dtype(object),
+                           as_array=True)
+        self.assertIsNone(column[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
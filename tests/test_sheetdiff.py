@@ -0,0 +1,70 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from sheetdiff import cell_text, column_letter, diff_rectangles  # noqa: E402
+
+
+class CellTextTest(unittest.TestCase):
+
+    def test_values(self):
+        self.assertEqual(cell_text(None), u'')
+        self.assertEqual(cell_text(True), u'TRUE')
+        self.assertEqual(cell_text(3.0), u'3')
+        self.assertEqual(cell_text(b'abc'), u'abc')
+        self.assertEqual(cell_text(0.1), u'0.1')
+
+    def test_float_precision(self):
+        self.assertNotEqual(cell_text(1234567.123456789),
+                            cell_text(1234567.12346))
+
+    def test_column_letter(self):
+        self.assertEqual(
+            [column_letter(i) for i in (0, 25, 26, 51, 52, 701, 702)],
+            ['A', 'Z', 'AA', 'AZ', 'BA', 'ZZ', 'AAA'])
+
+
+class DiffRectanglesTest(unittest.TestCase):
+
+    def test_no_changes(self):
+        current = [[1, 'a', 2.5], [u'b', True]]
+        values = [[1.0, u'a', 2.5], ['b', True]]
+        self.assertEqual(diff_rectangles(current, values), ([], 5))
+
+    def test_small_float_change(self):
+        rectangles, cells = diff_rectangles(
+            [[1234567.12346]], [[1234567.123456789]])
+        self.assertEqual(rectangles, [(0, 0, [[1234567.123456789]])])
+
+    def test_rows_joined_to_rectangle(self):
+        current = [[1, 2, 3], [1, 2, 3], [1, 2, 3], [1, 2, 3]]
+        values = [[1, 5, 6], [1, 7, 8], [1, 2, 3], [9, 2, 3]]
+        rectangles, cells = diff_rectangles(current, values)
+        self.assertEqual(cells, 12)
+        self.assertEqual(rectangles, [
+            (0, 1, [[5, 6], [7, 8]]),
+            (3, 0, [[9]]),
+        ])
+
+    def test_different_runs_are_not_joined(self):
+        rectangles, _ = diff_rectangles(
+            [[1, 2], [1, 2]], [[0, 2], [0, 0]])
+        self.assertEqual(rectangles, [(0, 0, [[0]]), (1, 0, [[0, 0]])])
+
+    def test_none_clears_cell(self):
+        rectangles, cells = diff_rectangles([['a', 'b']], [[None, 'b']])
+        self.assertEqual(rectangles, [(0, 0, [['']])])
+        self.assertEqual(diff_rectangles([['', 'b']], [[None, 'b']]),
+                         ([], 2))
+
+    def test_new_and_cleared_cells(self):
+        rectangles, cells = diff_rectangles([[1, 2, 3]], [[1], [4]])
+        self.assertEqual(cells, 4)
+        self.assertEqual(rectangles, [(0, 1, [['', '']]), (1, 0, [[4]])])
+
+
+if __name__ == '__main__':
+    unittest.main()
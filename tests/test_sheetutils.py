@@ -0,0 +1,222 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from sheetutils import (  # noqa: E402
+    BatchBuffer, iter_chunks, merge_request, merge_value_range,
+    value_range_cells
+)
+
+
+def insert(start, end, sheet=1, before=False):
+    return {'insertDimension': {
+        'range': {'sheetId': sheet, 'dimension': 'ROWS',
+                  'startIndex': start, 'endIndex': end},
+        'inheritFromBefore': before,
+    }}
+
+
+def delete(start, end, sheet=1):
+    return {'deleteDimension': {
+        'range': {'sheetId': sheet, 'dimension': 'ROWS',
+                  'startIndex': start, 'endIndex': end},
+    }}
+
+
+def rows(first, count, width=1, title='T'):
+    return {
+        'range': "'{}'!{}:{}".format(title, first, first + count - 1),
+        'values': [[0] * width for _ in range(count)],
+        'majorDimension': 'ROWS',
+    }
+
+
+class FakeSpreadsheet(object):
+
+    """Records the calls of BatchBuffer.flush."""
+
+    def __init__(self):
+        self.calls = []
+
+    def execute_batch_update(self, requests):
+        self.calls.append(('requests', list(requests)))
+
+    def execute_values_batch_update(self, data, value_input_option):
+        self.calls.append(('values', list(data)))
+
+
+class IterChunksTest(unittest.TestCase):
+
+    def test_rows_limit(self):
+        chunks = list(iter_chunks(([i] for i in range(7)), 3, 100))
+        self.assertEqual([len(chunk) for chunk in chunks], [3, 3, 1])
+        self.assertEqual(chunks[2], [[6]])
+
+    def test_cells_limit(self):
+        chunks = list(iter_chunks([[1, 2]] * 5, 100, 4))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+
+    def test_row_bigger_than_cells_limit_is_alone(self):
+        chunks = list(iter_chunks([[1], [1, 2, 3, 4, 5], [1]], 100, 2))
+        self.assertEqual(chunks, [[[1]], [[1, 2, 3, 4, 5]], [[1]]])
+
+    def test_empty(self):
+        self.assertEqual(list(iter_chunks([], 10, 10)), [])
+
+
+class MergeRequestTest(unittest.TestCase):
+
+    def test_insert_next_to_previous(self):
+        merged = merge_request(insert(5, 7), insert(7, 8))
+        self.assertEqual(merged, insert(5, 8))
+
+    def test_insert_inside_previous(self):
+        merged = merge_request(insert(5, 7), insert(6, 9))
+        self.assertEqual(merged, insert(5, 10))
+
+    def test_insert_at_start_of_previous(self):
+        self.assertEqual(merge_request(insert(5, 7), insert(5, 6)),
+                         insert(5, 8))
+
+    def test_insert_not_touching(self):
+        self.assertIsNone(merge_request(insert(5, 7), insert(8, 9)))
+        self.assertIsNone(merge_request(insert(5, 7), insert(4, 5)))
+
+    def test_insert_different_inherit_or_sheet(self):
+        self.assertIsNone(
+            merge_request(insert(5, 7), insert(7, 8, before=True)))
+        self.assertIsNone(merge_request(insert(5, 7), insert(7, 8, sheet=2)))
+
+    def test_delete_covering_previous_position(self):
+        # after deleting [5, 7) old row 7 is at 5, delete [3, 6) removes
+        # old rows 3, 4 and 7
+        self.assertEqual(merge_request(delete(5, 7), delete(3, 6)),
+                         delete(3, 8))
+        self.assertEqual(merge_request(delete(5, 7), delete(5, 6)),
+                         delete(5, 8))
+        self.assertEqual(merge_request(delete(5, 7), delete(4, 5)),
+                         delete(4, 7))
+
+    def test_delete_not_touching(self):
+        self.assertIsNone(merge_request(delete(5, 7), delete(6, 8)))
+        self.assertIsNone(merge_request(delete(5, 7), delete(1, 4)))
+
+    def test_insert_and_delete_are_not_merged(self):
+        self.assertIsNone(merge_request(insert(5, 7), delete(5, 7)))
+
+    def test_merge_does_not_change_arguments(self):
+        prev = insert(5, 7)
+        merge_request(prev, insert(7, 8))
+        self.assertEqual(prev, insert(5, 7))
+
+    def test_update_sheet_properties(self):
+        merged = merge_request(
+            {'updateSheetProperties': {
+                'properties': {'sheetId': 1, 'title': 'a',
+                               'gridProperties': {'rowCount': 3}},
+                'fields': 'title, gridProperties.rowCount'}},
+            {'updateSheetProperties': {
+                'properties': {'sheetId': 1, 'hidden': True,
+                               'gridProperties': {'columnCount': 4}},
+                'fields': 'hidden,gridProperties.columnCount'}})
+        self.assertEqual(merged['updateSheetProperties'], {
+            'properties': {'sheetId': 1, 'title': 'a', 'hidden': True,
+                           'gridProperties': {'rowCount': 3,
+                                              'columnCount': 4}},
+            'fields': 'title,gridProperties.rowCount,hidden,'
+                      'gridProperties.columnCount',
+        })
+
+    def test_update_sheet_properties_not_merged(self):
+        def update(sheet, fields):
+            return {'updateSheetProperties': {
+                'properties': {'sheetId': sheet}, 'fields': fields}}
+        self.assertIsNone(merge_request(update(1, 'title'),
+                                        update(2, 'title')))
+        self.assertIsNone(merge_request(update(1, '*'), update(1, 'title')))
+
+
+class MergeValueRangeTest(unittest.TestCase):
+
+    def test_adjacent_blocks(self):
+        merged = merge_value_range(rows(1, 2), rows(3, 1))
+        self.assertEqual(merged['range'], "'T'!1:3")
+        self.assertEqual(len(merged['values']), 3)
+
+    def test_gap_or_other_sheet(self):
+        self.assertIsNone(merge_value_range(rows(1, 2), rows(4, 1)))
+        self.assertIsNone(
+            merge_value_range(rows(1, 2), rows(3, 1, title='U')))
+
+    def test_block_shorter_than_range(self):
+        prev = rows(1, 3)
+        prev['values'] = prev['values'][:2]
+        self.assertIsNone(merge_value_range(prev, rows(4, 1)))
+
+    def test_a1_rectangles_are_not_merged(self):
+        prev = {'range': "'T'!A1:B1", 'values': [[1, 2]]}
+        self.assertIsNone(merge_value_range(prev, rows(2, 1)))
+
+    def test_limits(self):
+        self.assertIsNone(
+            merge_value_range(rows(1, 2), rows(3, 2), max_rows=3))
+        self.assertIsNone(merge_value_range(
+            rows(1, 2, width=3), rows(3, 2, width=3), max_cells=11))
+        self.assertIsNotNone(merge_value_range(
+            rows(1, 2, width=3), rows(3, 2, width=3), max_cells=12))
+
+
+class BatchBufferTest(unittest.TestCase):
+
+    def test_max_size_limits_every_call(self):
+        spreadsheet = FakeSpreadsheet()
+        buffer = BatchBuffer(spreadsheet, max_size=10)
+        buffer.add_values(
+            [rows(i * 2 + 1, 1, title=str(i)) for i in range(500)], 'RAW')
+        buffer.flush()
+        self.assertEqual(len(spreadsheet.calls), 50)
+        self.assertTrue(all(len(data) <= 10 for _, data in spreadsheet.calls))
+
+    def test_max_cells_limits_every_call(self):
+        spreadsheet = FakeSpreadsheet()
+        buffer = BatchBuffer(spreadsheet, max_cells=1000)
+        for chunk in range(100):
+            buffer.add_values([rows(chunk * 50 + 1, 50, width=20)], 'RAW')
+        buffer.flush()
+        cells = [sum(value_range_cells(item) for item in data)
+                 for _, data in spreadsheet.calls]
+        self.assertEqual(sum(cells), 100 * 50 * 20)
+        self.assertTrue(all(count <= 1000 for count in cells))
+
+    def test_caller_limits_of_merge(self):
+        spreadsheet = FakeSpreadsheet()
+        buffer = BatchBuffer(spreadsheet)
+        buffer.add_values([rows(1, 2)], 'RAW', max_rows=3)
+        buffer.add_values([rows(3, 2)], 'RAW', max_rows=3)
+        self.assertEqual(len(buffer), 2)
+        buffer.add_values([rows(5, 1)], 'RAW', max_rows=3)
+        self.assertEqual(len(buffer), 2)
+
+    def test_order_and_merge(self):
+        spreadsheet = FakeSpreadsheet()
+        buffer = BatchBuffer(spreadsheet)
+        buffer.add_requests([insert(1, 2)])
+        buffer.add_requests([insert(2, 3)])
+        buffer.add_values([rows(1, 1)], 'RAW')
+        buffer.add_values([rows(2, 1)], 'RAW')
+        buffer.add_requests([delete(1, 2)])
+        self.assertEqual(len(buffer), 3)
+        buffer.flush()
+        self.assertEqual(spreadsheet.calls, [
+            ('requests', [insert(1, 3)]),
+            ('values', [merge_value_range(rows(1, 1), rows(2, 1))]),
+            ('requests', [delete(1, 2)]),
+        ])
+        self.assertEqual(len(buffer), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()